@@ -0,0 +1,86 @@
+"""
+Benchmark de `?fields=` (proyecciones) en `GET /proyectos/por_concurso/{id}`:
+tamaño de la respuesta y latencia del listado completo frente a
+proyecciones con menos columnas y sin JOIN.
+
+Usa la base de `benchmarks.seed`; para un concurso de ~10k proyectos:
+
+    python -m benchmarks.seed --password ... --concursos 10 --proyectos 100000
+    python -m benchmarks.bench_campos --password ... -n 30
+
+Sin `--concurso` se elige el concurso con más proyectos.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.seed import argumentos_conexion, forzar_entorno
+
+VARIANTES = [
+    None,
+    "id,titulo,estado,puntuacion,estudiante_nombres,estudiante_apellidos,categoria_nombre",
+    "id,titulo,estado,puntuacion",
+    "id,titulo,estado",
+]
+
+
+async def _medir(cliente: httpx.AsyncClient, url: str, n: int) -> dict:
+    resp = await cliente.get(url)  # calentar
+    resp.raise_for_status()
+    tiempos: List[float] = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = await cliente.get(url)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return {
+        "filas": len(resp.json()),
+        "bytes": len(resp.content),
+        "media_ms": statistics.mean(tiempos),
+        "p50_ms": tiempos[len(tiempos) // 2],
+        "p95_ms": tiempos[int(len(tiempos) * 0.95)],
+    }
+
+
+async def correr(concurso: Optional[int], n: int) -> None:
+    import db
+    import main
+
+    if concurso is None:
+        concurso = db.query(
+            "SELECT concurso_id FROM proyectos GROUP BY concurso_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )[0]["concurso_id"]
+
+    transporte = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as cliente:
+        base = None
+        print(f"{'fields':<40} {'filas':>6} {'KiB':>9} {'Δ':>7} {'media':>8} {'p50':>8} {'p95':>8} {'Δ p50':>7}")
+        for fields in VARIANTES:
+            url = f"/proyectos/por_concurso/{concurso}" + (f"?fields={fields}" if fields else "")
+            r = await _medir(cliente, url, n)
+            base = base or r
+            etiqueta = fields if fields is None or len(fields) <= 40 else fields[:37] + "..."
+            print(
+                f"{etiqueta or '(completo)':<40} {r['filas']:>6} {r['bytes'] / 1024:>9.1f} "
+                f"{(r['bytes'] / base['bytes'] - 1) * 100:>+6.0f}% "
+                f"{r['media_ms']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                f"{(r['p50_ms'] / base['p50_ms'] - 1) * 100:>+6.0f}%"
+            )
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argumentos_conexion(parser)
+    parser.add_argument("--concurso", type=int)
+    parser.add_argument("-n", type=int, default=30, help="peticiones por variante")
+    args = parser.parse_args()
+    forzar_entorno(args)
+    asyncio.run(correr(args.concurso, args.n))
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,117 @@
+"""
+Tamaño y CPU de cada formato/compresión por endpoint: JSON o MessagePack,
+sin comprimir, gzip (niveles 1/6/9) y brotli (calidades 1/4/11, si está
+instalado). Sirve para elegir `COMPRESION_GZIP_NIVEL`,
+`COMPRESION_BR_CALIDAD` y `COMPRESION_MIN_BYTES`.
+
+No necesita MySQL: usa filas sintéticas con la forma de cada respuesta.
+
+Uso (desde api/):
+
+    python -m benchmarks.bench_compresion -n 20
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.bench_serializacion import filas_sinteticas
+from compresion import Compresor, brotli
+from respuestas import FilasJSON, FilasMsgPack, msgpack, proyectar
+from schemas import CategoriaResponse, ConcursoDbResponse, ProyectoResponse
+
+
+def _concursos(n: int) -> List[Dict[str, Any]]:
+    base = datetime(2025, 1, 1)
+    return proyectar([
+        {
+            "id": i,
+            "nombre": f"Concurso de Proyectos EPIS {i}",
+            "administrador_id": 1 + i % 5,
+            "fecha_limite_inscripcion": base + timedelta(days=30 + i),
+            "fecha_revision": base + timedelta(days=45 + i),
+            "fecha_confirmacion_aceptados": base + timedelta(days=60 + i),
+            "fecha_creacion": base + timedelta(days=i),
+        }
+        for i in range(n)
+    ], ConcursoDbResponse)
+
+
+def _stats(categorias: int) -> Dict[str, Any]:
+    estados = {"enviado": 120, "en_revision": 40, "aprobado": 25, "rechazado": 10, "ganador": 3}
+    return {
+        "concurso_id": 1,
+        "total": 198 * categorias,
+        "por_estado": {k: v * categorias for k, v in estados.items()},
+        "promedio_puntuacion": 14.37,
+        "categorias": [
+            {"categoria_id": i, "categoria_nombre": f"Categoria {i}", "total": 198,
+             "por_estado": estados, "promedio_puntuacion": 14.37}
+            for i in range(categorias)
+        ],
+    }
+
+
+def endpoints() -> List[Tuple[str, Any]]:
+    proyectos = filas_sinteticas(10000)
+    return [
+        ("GET /proyectos/por_concurso (10k)", proyectar(proyectos, ProyectoResponse)),
+        ("GET /proyectos/por_concurso?limit=50",
+         {"items": proyectar(proyectos[:50], ProyectoResponse), "next_cursor": "WyIyMDI1LTA2LTAxVDEyOjAwOjAwIiwgNTBd"}),
+        ("GET /proyectos/por_concurso?fields=id,titulo,estado (10k)",
+         [{"id": p["id"], "titulo": p["titulo"], "estado": p["estado"]} for p in proyectos]),
+        ("GET /concursos/ (50)", _concursos(50)),
+        ("GET /categorias/por_concurso (10)", proyectar(
+            [{"id": i, "nombre": f"Categoria {i}", "concurso_id": 1, "rango_ciclos": "I a III ciclo"} for i in range(10)],
+            CategoriaResponse,
+        )),
+        ("GET /concursos/{id}/stats (10 categorías)", _stats(10)),
+    ]
+
+
+def _tiempo(fn: Callable[[], bytes], n: int) -> Tuple[bytes, float]:
+    tiempos = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        salida = fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return salida, tiempos[len(tiempos) // 2]
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=20, help="repeticiones por medición (se reporta la mediana)")
+    args = parser.parse_args()
+
+    formatos = [("json", lambda c: FilasJSON(c).body)]
+    if msgpack is not None:
+        formatos.append(("msgpack", lambda c: FilasMsgPack(c).body))
+    compresiones = [("-", None)] + [(f"gzip-{n}", ("gzip", n)) for n in (1, 6, 9)]
+    if brotli is not None:
+        compresiones += [(f"br-{q}", ("br", q)) for q in (1, 4, 11)]
+
+    for nombre, contenido in endpoints():
+        print(f"\n{nombre}")
+        print(f"  {'formato':<8} {'compresión':<10} {'bytes':>10} {'ratio':>7} {'serializar ms':>14} {'comprimir ms':>13}")
+        base = None
+        for formato, serializar in formatos:
+            cuerpo, t_ser = _tiempo(lambda: serializar(contenido), args.n)
+            base = base or len(cuerpo)
+            for etiqueta, conf in compresiones:
+                if conf is None:
+                    salida, t_comp = cuerpo, 0.0
+                else:
+                    cod, nivel = conf
+                    kw = {"nivel_gzip": nivel} if cod == "gzip" else {"calidad_br": nivel}
+                    # Calidad 11 de brotli es muy lenta: menos repeticiones
+                    reps = max(1, args.n // 5) if (cod, nivel) == ("br", 11) else args.n
+                    salida, t_comp = _tiempo(lambda: Compresor(cod, **kw).comprimir(cuerpo, final=True), reps)
+                print(
+                    f"  {formato:<8} {etiqueta:<10} {len(salida):>10} {len(salida) / base:>7.3f} "
+                    f"{t_ser:>14.2f} {t_comp:>13.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,74 @@
+"""
+Benchmark: rutas síncronas (threadpool de FastAPI) vs. `db_async`.
+
+Simula N clientes concurrentes que ejecutan la misma consulta contra una
+base MySQL local y reporta throughput y errores (p.ej. pool agotado).
+
+Uso (desde api/, con las variables DB_* apuntando a un MySQL local):
+
+    python -m benchmarks.bench_db_async --clients 200 --requests 20
+"""
+import argparse
+import asyncio
+import time
+
+import anyio.to_thread
+
+import db
+import db_async
+
+SQL = "SELECT id, nombre FROM concursos ORDER BY fecha_creacion DESC, id DESC LIMIT 50"
+
+
+async def _cliente_sync(n: int, sql: str, errores: list) -> None:
+    # Equivale a una ruta `def`: FastAPI la corre en su threadpool (40 hilos)
+    for _ in range(n):
+        try:
+            await anyio.to_thread.run_sync(db.query, sql)
+        except Exception as e:
+            errores.append(type(e).__name__)
+
+
+async def _cliente_async(n: int, sql: str, errores: list) -> None:
+    for _ in range(n):
+        try:
+            await db_async.query(sql)
+        except Exception as e:
+            errores.append(type(e).__name__)
+
+
+async def _medir(nombre: str, cliente, clientes: int, n: int, sql: str) -> dict:
+    errores: list = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente(n, sql, errores) for _ in range(clientes)))
+    dt = time.perf_counter() - t0
+    total = clientes * n
+    ok = total - len(errores)
+    res = {
+        "modo": nombre,
+        "peticiones": total,
+        "ok": ok,
+        "errores": len(errores),
+        "segundos": round(dt, 3),
+        "req_por_seg": round(ok / dt, 1) if dt else 0.0,
+    }
+    print(f"{nombre:>6}: {ok}/{total} ok en {dt:.2f}s -> {res['req_por_seg']} req/s ({len(errores)} errores)")
+    return res
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="peticiones por cliente")
+    parser.add_argument("--sql", default=SQL)
+    args = parser.parse_args()
+
+    print(f"Pool MySQL: {db.DB_POOL_SIZE} conexiones, {args.clients} clientes concurrentes")
+    db.query("SELECT 1")  # calentar el pool
+    await _medir("sync", _cliente_sync, args.clients, args.requests, args.sql)
+    await _medir("async", _cliente_async, args.clients, args.requests, args.sql)
+    db_async.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Microbenchmark: texto SQL vs. sentencias preparadas (`db.query_named`)
+para los listados de `routers/proyectos.py`.
+
+Con `?limit=1` el resultado es mínimo, así la diferencia refleja sobre todo
+el costo de parseo/planificación de la consulta en el servidor frente al
+viaje extra de COM_STMT_RESET que mysql-connector hace antes de cada
+ejecución preparada. Correrlo contra la base real (no un MySQL local, donde
+el viaje es casi gratis) antes de activar `DB_PREPARED=1`.
+
+Uso (desde api/, con las variables DB_* apuntando a un MySQL local):
+
+    python -m benchmarks.bench_prepared --concurso 1 --categoria 1 --estudiante 1 -n 2000
+"""
+import argparse
+import statistics
+import time
+
+import db
+import main  # noqa: F401  registra las consultas con nombre de los routers
+
+
+def _medir(fn, n: int) -> dict:
+    fn()  # calentar (prepara la sentencia en la conexión)
+    tiempos = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return {
+        "media_ms": round(statistics.mean(tiempos), 3),
+        "p50_ms": round(tiempos[len(tiempos) // 2], 3),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95)], 3),
+    }
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurso", type=int, default=1)
+    parser.add_argument("--categoria", type=int, default=1)
+    parser.add_argument("--estudiante", type=int, default=1)
+    parser.add_argument("-n", type=int, default=2000, help="iteraciones por variante")
+    args = parser.parse_args()
+    # La variante "preparada" mide query_named con sentencias del servidor
+    db.DB_PREPARED = True
+
+    casos = [
+        ("proyectos.por_concurso", args.concurso),
+        ("proyectos.por_categoria", args.categoria),
+        ("proyectos.por_estudiante", args.estudiante),
+    ]
+    print(f"{'consulta':<28} {'modo':<10} {'media':>8} {'p50':>8} {'p95':>8}")
+    for key, valor in casos:
+        key_pagina = f"{key}:pagina"
+        params = (valor, 2)  # LIMIT 1 + la fila extra de paginación
+        # Copia del texto: otro objeto str, así el cursor normal no reutiliza nada
+        sql = "".join(db.named_sql(key_pagina))
+        for modo, fn in (
+            ("texto", lambda: db.query(sql, params)),
+            ("preparada", lambda: db.query_named(key_pagina, params)),
+        ):
+            r = _medir(fn, args.n)
+            print(f"{key:<28} {modo:<10} {r['media_ms']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,106 @@
+"""
+Serialización de un listado de 10k proyectos: camino estándar de FastAPI
+(`response_model` valida y serializa cada fila con Pydantic) frente a
+`respuestas.respuesta_filas` (orjson sobre las filas proyectadas).
+
+No necesita MySQL: monta una app mínima con dos rutas que devuelven las
+mismas filas sintéticas (con los tipos que entrega el conector: datetime y
+Decimal) y las mide en proceso con httpx.
+
+Uso (desde api/):
+
+    python -m benchmarks.bench_serializacion --filas 10000 -n 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from respuestas import respuesta_filas
+from schemas import ProyectoResponse
+
+
+def filas_sinteticas(n: int) -> List[Dict[str, Any]]:
+    base = datetime(2025, 6, 1, 12, 0, 0)
+    return [
+        {
+            "id": i,
+            "titulo": f"Proyecto {i}",
+            "github_url": f"https://github.com/bench/proyecto-{i}",
+            "zip_url": f"https://upt.sharepoint.com/proyectos/{i}.zip",
+            "estudiante_id": 1 + i % 5000,
+            "concurso_id": 1,
+            "categoria_id": 1 + i % 10,
+            "fecha_envio": base - timedelta(minutes=i, microseconds=i),
+            "estado": "aprobado" if i % 3 else "enviado",
+            "puntuacion": Decimal("15.50") if i % 3 else None,
+            "comentarios": "Buen trabajo" if i % 2 else None,
+            "estudiante_nombres": f"Estudiante{i}",
+            "estudiante_apellidos": f"Apellido{i % 997}",
+            "estudiante_correo": f"est{i}@upt.pe",
+            "categoria_nombre": f"Categoria {i % 10}",
+        }
+        for i in range(n)
+    ]
+
+
+def app_bench(filas: List[Dict[str, Any]]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/pydantic", response_model=List[ProyectoResponse])
+    async def con_pydantic():
+        return filas
+
+    @app.get("/rapido", response_model=List[ProyectoResponse])
+    async def rapido():
+        return respuesta_filas(filas, ProyectoResponse)
+
+    return app
+
+
+async def _medir(cliente: httpx.AsyncClient, ruta: str, n: int) -> Dict[str, float]:
+    resp = await cliente.get(ruta)
+    tiempos = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = await cliente.get(ruta)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return {
+        "bytes": len(resp.content),
+        "media_ms": statistics.mean(tiempos),
+        "p50_ms": tiempos[len(tiempos) // 2],
+        "p95_ms": tiempos[int(len(tiempos) * 0.95)],
+        "json": resp.json(),
+    }
+
+
+async def correr(n_filas: int, n: int) -> None:
+    app = app_bench(filas_sinteticas(n_filas))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+        antes = await _medir(cliente, "/pydantic", n)
+        despues = await _medir(cliente, "/rapido", n)
+    assert antes["json"] == despues["json"], "las dos rutas deben producir el mismo JSON"
+    print(f"{n_filas} filas, {n} peticiones por ruta ({antes['bytes'] / 1024:.0f} KiB, JSON idéntico)")
+    print(f"{'ruta':<16} {'media':>9} {'p50':>9} {'p95':>9}")
+    for nombre, r in (("pydantic", antes), ("respuesta_filas", despues)):
+        print(f"{nombre:<16} {r['media_ms']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+    print(f"aceleración p50: x{antes['p50_ms'] / despues['p50_ms']:.1f}")
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("-n", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(correr(args.filas, args.n))
+
+
+if __name__ == "__main__":
+    main_bench()
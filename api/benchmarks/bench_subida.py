@@ -0,0 +1,211 @@
+"""
+Prueba y mide `integrations.subida` contra un servidor local que imita las
+upload sessions de Graph (no necesita credenciales ni red).
+
+El servidor falla a propósito una fracción de los PUT (`--fallos`): 503,
+conexión cortada después de guardar el chunk, conexión cortada sin
+guardarlo y recepción parcial (202 con `nextExpectedRanges` a mitad del
+chunk). El primer PUT del último chunk siempre se corta después de
+guardarlo y cerrar la sesión, como hace Graph: el cliente debe confirmar el
+driveItem en vez de dar la sesión por expirada. Para cada tamaño de chunk se verifica que el archivo reconstruido
+sea idéntico (sha256) y se reporta tiempo, PUTs, reanudaciones y el pico
+de memoria Python durante la subida (tracemalloc, incluye al servidor
+falso, que corre en el mismo proceso): debe ser unas pocas veces el
+tamaño de un chunk y no depender del tamaño del archivo.
+
+Uso (desde api/):
+
+    python -m benchmarks.bench_subida --mb 64 --chunks 320k,5m,10m --fallos 0.2
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# Backoff corto: aquí los 503 son simulados
+os.environ.setdefault("HTTP_BACKOFF_BASE", "0.01")
+os.environ.setdefault("ONEDRIVE_UPLOAD_REANUDACIONES", "20")
+
+from integrations import cliente_http, subida  # noqa: E402
+
+MODOS_FALLO = ("503", "cortar_guardado", "cortar_perdido", "parcial")
+
+
+class _Sesion:
+    def __init__(self, path: str):
+        self.archivo = tempfile.TemporaryFile()
+        self.recibido = 0
+        self.total = None
+        self.path = path
+        self.completa = False
+        self.final_cortado = False
+
+
+class ServidorGraph:
+    """Upload sessions de Graph en memoria de disco (un archivo temporal por sesión)."""
+
+    def __init__(self, fallos: float, semilla: int = 7):
+        self.fallos = fallos
+        self.rnd = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.sesiones: Dict[str, _Sesion] = {}
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.conteo: Dict[str, int] = {"put": 0, "get_estado": 0, "get_item": 0, **{m: 0 for m in MODOS_FALLO}}
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, data: Any, extra: Dict[str, str] = None) -> None:
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                largo = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(largo)
+                if not self.path.endswith(":/createUploadSession"):
+                    return self._json(404, {"error": "not found"})
+                with servidor.lock:
+                    sid = f"s{len(servidor.sesiones)}"
+                    servidor.sesiones[sid] = _Sesion(self.path)
+                host = self.headers["Host"]
+                self._json(200, {"uploadUrl": f"http://{host}/up/{sid}"})
+
+            def _completar(self, sesion: _Sesion) -> Dict[str, Any]:
+                sesion.completa = True
+                sesion.archivo.seek(0)
+                h = hashlib.sha256()
+                for bloque in iter(lambda: sesion.archivo.read(1 << 20), b""):
+                    h.update(bloque)
+                item = {"id": "item-" + self.path.rsplit("/", 1)[-1], "size": sesion.total, "sha256": h.hexdigest()}
+                servidor.items[sesion.path.rsplit(":/createUploadSession", 1)[0]] = item
+                return item
+
+            def do_GET(self):
+                if self.path in servidor.items:
+                    servidor.conteo["get_item"] += 1
+                    return self._json(200, servidor.items[self.path])
+                sesion = servidor.sesiones.get(self.path.rsplit("/", 1)[-1])
+                if sesion is None or sesion.completa:
+                    return self._json(404, {"error": "itemNotFound"})
+                servidor.conteo["get_estado"] += 1
+                self._json(200, {"nextExpectedRanges": [f"{sesion.recibido}-"]})
+
+            def do_PUT(self):
+                sesion = servidor.sesiones.get(self.path.rsplit("/", 1)[-1])
+                largo = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(largo)
+                if sesion is None or sesion.completa:
+                    return self._json(404, {"error": "itemNotFound"})
+                rango, total = self.headers["Content-Range"].split(" ", 1)[1].split("/")
+                inicio, fin = (int(x) for x in rango.split("-"))
+                sesion.total = int(total)
+                servidor.conteo["put"] += 1
+                if inicio != sesion.recibido or fin - inicio + 1 != len(data):
+                    return self._json(416, {"error": "invalidRange", "nextExpectedRanges": [f"{sesion.recibido}-"]})
+
+                ultimo = fin + 1 == sesion.total
+                with servidor.lock:
+                    modo = servidor.rnd.choice(MODOS_FALLO) if servidor.rnd.random() < servidor.fallos else None
+                    if ultimo and not sesion.final_cortado:
+                        sesion.final_cortado, modo = True, "cortar_guardado"
+                if modo:
+                    servidor.conteo[modo] += 1
+                if modo == "503":
+                    return self._json(503, {"error": "serviceNotAvailable"}, {"Retry-After": "0"})
+                if modo == "cortar_perdido":
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                if modo == "parcial":
+                    data = data[: len(data) // 2]
+                sesion.archivo.seek(inicio)
+                sesion.archivo.write(data)
+                sesion.recibido = inicio + len(data)
+                if modo == "cortar_guardado":
+                    if sesion.recibido == sesion.total:
+                        self._completar(sesion)
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                if sesion.recibido < sesion.total:
+                    return self._json(202, {"nextExpectedRanges": [f"{sesion.recibido}-"]})
+                self._json(201, self._completar(sesion))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+def _parse_tamano(texto: str) -> int:
+    texto = texto.strip().lower()
+    mult = {"k": 1024, "m": 1024 * 1024}.get(texto[-1], 1)
+    return int(float(texto.rstrip("km")) * mult)
+
+
+def _archivo_de_prueba(mb: int) -> Any:
+    f = tempfile.TemporaryFile()
+    h = hashlib.sha256()
+    rnd = random.Random(1)
+    for _ in range(mb):
+        bloque = rnd.randbytes(1024 * 1024)
+        h.update(bloque)
+        f.write(bloque)
+    f.seek(0)
+    return f, h.hexdigest()
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=64, help="tamaño del archivo de prueba (MiB)")
+    parser.add_argument("--chunks", default="320k,5m,10m", help="tamaños de chunk (se redondean a 320 KiB)")
+    parser.add_argument("--fallos", type=float, default=0.2, help="fracción de PUT que fallan")
+    args = parser.parse_args()
+
+    archivo, esperado = _archivo_de_prueba(args.mb)
+    print(f"archivo {args.mb} MiB, fallos {args.fallos:.0%}")
+    print(f"{'chunk':>10} {'s':>7} {'MiB/s':>7} {'PUT':>5} {'reanud.':>8} {'conf.':>5} {'fallos inyectados':>28} {'pico RAM':>10}  ok")
+    resultados: List[Dict[str, Any]] = []
+    for texto in args.chunks.split(","):
+        chunk = subida.tamano_chunk(_parse_tamano(texto))
+        servidor = ServidorGraph(args.fallos)
+        cliente_http.reset()
+        archivo.seek(0)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        item = subida.subir_archivo("token", f"{servidor.url}/drive/root:/bench/archivo.zip", archivo, chunk_bytes=chunk)
+        segundos = time.perf_counter() - t0
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        servidor.httpd.shutdown()
+        c = servidor.conteo
+        inyectados = "/".join(str(c[m]) for m in MODOS_FALLO)
+        ok = item.get("sha256") == esperado and item.get("size") == args.mb * 1024 * 1024
+        print(
+            f"{chunk // 1024:>8}K {segundos:>7.2f} {args.mb / segundos:>7.1f} {c['put']:>5} {c['get_estado']:>8} {c['get_item']:>5} "
+            f"{inyectados:>28} {pico / 1024 / 1024:>8.1f}M  {'sí' if ok else 'NO'}"
+        )
+        resultados.append({"chunk": chunk, "ok": ok})
+    print(f"(fallos inyectados: {'/'.join(MODOS_FALLO)})")
+    if not all(r["ok"] for r in resultados):
+        raise SystemExit("El archivo reconstruido no coincide")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,241 @@
+"""
+Benchmark de extremo a extremo: ejecuta los routers de la API con
+concurrencia fija contra la base sembrada por `benchmarks.seed` y reporta
+throughput y latencias p50/p95/p99 por endpoint.
+
+Por defecto la app corre en el mismo proceso (httpx + ASGITransport, sin
+red); con `--url` se mide un uvicorn ya levantado. Las variables DB_HOST y
+DB_NAME se fuerzan a `--host`/`--database` antes de importar la app, para
+no golpear nunca la base de producción configurada en `.env`.
+
+Los resultados se guardan como JSON en `benchmarks/resultados/` (o
+`--salida`) y se comparan entre commits con `benchmarks.comparar`.
+
+Uso (desde api/):
+
+    python -m benchmarks.seed --password ...
+    python -m benchmarks.carga --password ... --concurrencia 1,10,50 -n 500
+    python -m benchmarks.comparar resultados/antes.json resultados/despues.json
+
+Requiere `httpx` (ver benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.seed import PALABRAS, PASSWORD_BENCH, argumentos_conexion, forzar_entorno
+
+Peticion = Tuple[str, str, Optional[Dict[str, Any]]]
+RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+
+def _percentil(orden: List[float], p: float) -> float:
+    if not orden:
+        return 0.0
+    return orden[min(len(orden) - 1, int(len(orden) * p))]
+
+
+def _rangos() -> Dict[str, Tuple[int, int]]:
+    """Rangos de ids sembrados, leídos directamente de la base."""
+    import db
+
+    rangos = {}
+    for tabla in ("administradores", "estudiantes", "concursos", "categorias", "proyectos"):
+        fila = db.query(f"SELECT MIN(id) AS a, MAX(id) AS b FROM {tabla}")[0]
+        if fila["a"] is None:
+            raise SystemExit(f"La tabla {tabla} está vacía: ejecute antes benchmarks.seed")
+        rangos[tabla] = (fila["a"], fila["b"])
+    return rangos
+
+
+def escenarios(r: Dict[str, Tuple[int, int]]) -> List[Tuple[str, Callable[[random.Random], Peticion]]]:
+    """(nombre, generador de petición) por cada endpoint medido."""
+
+    def rid(rnd: random.Random, tabla: str) -> int:
+        return rnd.randint(*r[tabla])
+
+    def admin(rnd):
+        return f"admin{rid(rnd, 'administradores') - r['administradores'][0]}@bench.upt.pe"
+
+    def est(rnd):
+        return f"est{rid(rnd, 'estudiantes') - r['estudiantes'][0]}@bench.upt.pe"
+
+    return [
+        ("POST /admin/auth/login", lambda rnd: (
+            "POST", "/admin/auth/login", {"correo": admin(rnd), "contrasena": PASSWORD_BENCH})),
+        ("GET /admin/auth/by_email/{correo}", lambda rnd: (
+            "GET", f"/admin/auth/by_email/{admin(rnd)}", None)),
+        ("POST /estudiantes/auth/login", lambda rnd: (
+            "POST", "/estudiantes/auth/login", {"correo": est(rnd), "contrasena": PASSWORD_BENCH})),
+        ("GET /estudiantes/auth/by_email/{correo}", lambda rnd: (
+            "GET", f"/estudiantes/auth/by_email/{est(rnd)}", None)),
+        ("GET /concursos/", lambda rnd: ("GET", "/concursos/", None)),
+        ("GET /concursos/admin/{id}", lambda rnd: (
+            "GET", f"/concursos/admin/{rid(rnd, 'administradores')}", None)),
+        ("GET /concursos/{id}/stats", lambda rnd: (
+            "GET", f"/concursos/{rid(rnd, 'concursos')}/stats", None)),
+        ("GET /categorias/por_concurso/{id}", lambda rnd: (
+            "GET", f"/categorias/por_concurso/{rid(rnd, 'concursos')}", None)),
+        ("GET /proyectos/por_concurso/{id}", lambda rnd: (
+            "GET", f"/proyectos/por_concurso/{rid(rnd, 'concursos')}", None)),
+        ("GET /proyectos/por_concurso/{id}?limit=50", lambda rnd: (
+            "GET", f"/proyectos/por_concurso/{rid(rnd, 'concursos')}?limit=50", None)),
+        ("GET /proyectos/por_categoria/{id}?limit=50", lambda rnd: (
+            "GET", f"/proyectos/por_categoria/{rid(rnd, 'categorias')}?limit=50", None)),
+        ("GET /proyectos/estudiante/{id}", lambda rnd: (
+            "GET", f"/proyectos/estudiante/{rid(rnd, 'estudiantes')}", None)),
+        ("GET /proyectos/ranking/{id}?top=10", lambda rnd: (
+            "GET", f"/proyectos/ranking/{rid(rnd, 'concursos')}?top=10", None)),
+        ("GET /proyectos/buscar?q=&concurso_id=", lambda rnd: (
+            "GET", f"/proyectos/buscar?q={'+'.join(rnd.sample(PALABRAS, 2))}&concurso_id={rid(rnd, 'concursos')}", None)),
+        ("GET /proyectos/buscar?q=<apellido>", lambda rnd: (
+            "GET", f"/proyectos/buscar?q=Apellido{rnd.randrange(997)}", None)),
+        ("POST /proyectos/", lambda rnd: ("POST", "/proyectos/", _proyecto(rnd, r))),
+        ("PATCH /proyectos/{id}/estado", lambda rnd: (
+            "PATCH", f"/proyectos/{rid(rnd, 'proyectos')}/estado",
+            {"estado": rnd.choice(["en_revision", "aprobado", "rechazado"]),
+             "puntuacion": round(rnd.uniform(0, 20), 2)})),
+    ]
+
+
+def _proyecto(rnd: random.Random, r: Dict[str, Tuple[int, int]]) -> Dict[str, Any]:
+    # La categoría debe pertenecer al concurso: el seed asigna un bloque
+    # contiguo de categorías por concurso
+    concurso = rnd.randint(*r["concursos"])
+    total_conc = r["concursos"][1] - r["concursos"][0] + 1
+    por_concurso = (r["categorias"][1] - r["categorias"][0] + 1) // total_conc
+    categoria = r["categorias"][0] + (concurso - r["concursos"][0]) * por_concurso + rnd.randrange(por_concurso)
+    return {
+        "titulo": "Proyecto bench",
+        "github_url": "https://github.com/bench/nuevo",
+        "estudiante_id": rnd.randint(*r["estudiantes"]),
+        "concurso_id": concurso,
+        "categoria_id": categoria,
+    }
+
+
+async def medir(
+    cliente: httpx.AsyncClient,
+    generador: Callable[[random.Random], Peticion],
+    concurrencia: int,
+    n: int,
+    rnd: random.Random,
+) -> Dict[str, Any]:
+    latencias: List[float] = []
+    errores = 0
+    pendientes = n
+
+    async def trabajador() -> None:
+        nonlocal pendientes, errores
+        while pendientes > 0:
+            pendientes -= 1
+            metodo, ruta, cuerpo = generador(rnd)
+            t0 = time.perf_counter()
+            try:
+                resp = await cliente.request(metodo, ruta, json=cuerpo)
+                await resp.aread()
+                if resp.status_code >= 400:
+                    errores += 1
+            except httpx.HTTPError:
+                errores += 1
+            latencias.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    total = time.perf_counter() - t0
+    latencias.sort()
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": len(latencias),
+        "errores": errores,
+        "rps": round(len(latencias) / total, 1) if total else 0.0,
+        "p50_ms": round(_percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(_percentil(latencias, 0.95) * 1000, 2),
+        "p99_ms": round(_percentil(latencias, 0.99) * 1000, 2),
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def correr(args) -> Dict[str, Any]:
+    rangos = _rangos()
+    if args.url:
+        transporte = None
+        base = args.url
+    else:
+        import main
+
+        transporte = httpx.ASGITransport(app=main.app)
+        base = "http://bench"
+
+    limites = httpx.Limits(max_connections=max(args.concurrencia))
+    seleccion = [e for e in escenarios(rangos) if not args.filtro or args.filtro in e[0]]
+    resultados = []
+    async with httpx.AsyncClient(
+        transport=transporte, base_url=base, limits=limites, timeout=60
+    ) as cliente:
+        for nombre, generador in seleccion:
+            for conc in args.concurrencia:
+                rnd = random.Random(f"{nombre}:{conc}")
+                # Calentamiento: pool, sentencias preparadas y caché de InnoDB
+                await medir(cliente, generador, conc, min(args.n, conc * 2), rnd)
+                r = await medir(cliente, generador, conc, args.n, rnd)
+                r["endpoint"] = nombre
+                resultados.append(r)
+                print(
+                    f"{nombre:<46} c={conc:<4} {r['rps']:>9.1f} req/s "
+                    f"p50={r['p50_ms']:>8.2f} p95={r['p95_ms']:>8.2f} "
+                    f"p99={r['p99_ms']:>8.2f} ms  errores={r['errores']}"
+                )
+
+    return {
+        "commit": _commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "modo": "http" if args.url else "asgi",
+        "n": args.n,
+        "rangos": rangos,
+        "resultados": resultados,
+    }
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argumentos_conexion(parser)
+    parser.add_argument("--url", help="medir un servidor ya levantado en lugar de la app en proceso")
+    parser.add_argument("--concurrencia", default="1,10,50",
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("-n", type=int, default=500, help="peticiones por endpoint y nivel de concurrencia")
+    parser.add_argument("--filtro", help="solo endpoints cuyo nombre contenga este texto")
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    args = parser.parse_args()
+
+    forzar_entorno(args)
+
+    informe = asyncio.run(correr(args))
+    salida = args.salida
+    if not salida:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        nombre = f"{datetime.now():%Y%m%d-%H%M%S}_{informe['commit'] or 'local'}.json"
+        salida = os.path.join(RESULTADOS, nombre)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+
+if __name__ == "__main__":
+    main_bench()
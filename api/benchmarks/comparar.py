@@ -0,0 +1,49 @@
+"""
+Compara dos archivos de resultados de `benchmarks.carga` (antes/después)
+por endpoint y nivel de concurrencia.
+
+Uso (desde api/):
+
+    python -m benchmarks.comparar resultados/antes.json resultados/despues.json
+"""
+import argparse
+import json
+from typing import Any, Dict, Tuple
+
+
+def _cargar(path: str) -> Tuple[Dict[str, Any], Dict[Tuple[str, int], Dict[str, Any]]]:
+    with open(path, encoding="utf-8") as f:
+        informe = json.load(f)
+    return informe, {(r["endpoint"], r["concurrencia"]): r for r in informe["resultados"]}
+
+
+def _delta(antes: float, despues: float) -> str:
+    if not antes:
+        return "    -"
+    return f"{(despues - antes) / antes * 100:+6.1f}%"
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("antes")
+    parser.add_argument("despues")
+    args = parser.parse_args()
+
+    info_a, antes = _cargar(args.antes)
+    info_d, despues = _cargar(args.despues)
+    print(f"antes: {info_a.get('commit')} ({info_a.get('fecha')})  "
+          f"después: {info_d.get('commit')} ({info_d.get('fecha')})")
+    print(f"{'endpoint':<46} {'c':>4} {'req/s':>10} {'Δ':>8} {'p95 ms':>9} {'Δ':>8} {'p99 ms':>9} {'Δ':>8}")
+    for clave in sorted(antes.keys() & despues.keys()):
+        a, d = antes[clave], despues[clave]
+        print(
+            f"{clave[0]:<46} {clave[1]:>4} {d['rps']:>10.1f} {_delta(a['rps'], d['rps']):>8} "
+            f"{d['p95_ms']:>9.2f} {_delta(a['p95_ms'], d['p95_ms']):>8} "
+            f"{d['p99_ms']:>9.2f} {_delta(a['p99_ms'], d['p99_ms']):>8}"
+        )
+    for clave in sorted(antes.keys() ^ despues.keys()):
+        print(f"{clave[0]:<46} {clave[1]:>4} (solo en {'antes' if clave in antes else 'después'})")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,208 @@
+"""
+Crea y llena una base MySQL local para los benchmarks.
+
+Aplica el esquema de las secciones 2 (tablas) y 3 (índices) de
+DB_SETUP.md sobre una base dedicada (por defecto `epis_bench`, que se
+BORRA y recrea) y la llena con volúmenes realistas. Los datos son
+deterministas (semilla fija) para poder comparar corridas entre commits.
+
+Uso (desde api/):
+
+    python -m benchmarks.seed --host 127.0.0.1 --user root --password ... \\
+        --concursos 50 --categorias 10 --estudiantes 5000 --proyectos 100000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import List
+
+import mysql.connector
+
+DB_SETUP = os.path.join(os.path.dirname(__file__), "..", "..", "DB_SETUP.md")
+ESTADOS = ["enviado", "en_revision", "aprobado", "rechazado", "ganador"]
+PASSWORD_BENCH = "bench"
+LOTE = 1000
+# Vocabulario de títulos, para que la búsqueda de texto tenga una
+# distribución de términos parecida a la real
+PALABRAS = [
+    "sistema", "gestion", "aplicacion", "movil", "plataforma", "web", "reservas", "inventario",
+    "academico", "biblioteca", "matricula", "asistencia", "ventas", "clinica", "turismo", "transporte",
+    "energia", "agricultura", "inteligencia", "artificial", "vision", "robot", "sensores", "realidad",
+    "aumentada", "blockchain", "chatbot", "analitica", "datos", "seguridad", "red", "videojuego",
+]
+
+
+def sentencias_de_setup(path: str = DB_SETUP) -> List[str]:
+    """
+    Sentencias `CREATE` de las secciones 2) y 3) de DB_SETUP.md; se omiten
+    las de migración y relleno (la base se crea desde cero).
+    """
+    with open(path, encoding="utf-8") as f:
+        texto = f.read()
+    secciones = re.split(r"^## ", texto, flags=re.M)
+    sql = ""
+    for sec in secciones:
+        if sec.startswith(("2)", "3)")):
+            sql += "\n".join(re.findall(r"```sql\n(.*?)```", sec, re.S))
+    sin_comentarios = re.sub(r"--[^\n]*", "", sql)
+    sentencias = [s.strip() for s in sin_comentarios.split(";") if s.strip()]
+    return [s for s in sentencias if s.upper().startswith("CREATE")]
+
+
+def _insertar(cur, sql: str, filas: list) -> None:
+    for i in range(0, len(filas), LOTE):
+        cur.executemany(sql, filas[i : i + LOTE])
+
+
+def seed(args) -> None:
+    # Importado aquí: `resumen` importa `db`, que fija DB_HOST al cargarse
+    from resumen import SQL_RECONSTRUIR
+
+    rnd = random.Random(42)
+    cnx = mysql.connector.connect(
+        host=args.host, port=args.port, user=args.user, password=args.password
+    )
+    cur = cnx.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cur.execute(
+        f"CREATE DATABASE `{args.database}` DEFAULT CHARACTER SET utf8mb4 "
+        "DEFAULT COLLATE utf8mb4_0900_ai_ci"
+    )
+    cur.execute(f"USE `{args.database}`")
+    for sentencia in sentencias_de_setup():
+        cur.execute(sentencia)
+
+    ahora = datetime(2025, 6, 1)
+    admins = [
+        (f"Admin{i}", "Bench", f"admin{i}@bench.upt.pe", "999000000", PASSWORD_BENCH)
+        for i in range(args.admins)
+    ]
+    _insertar(
+        cur,
+        "INSERT INTO administradores(nombres, apellidos, correo, numero_telefono, contrasena_hash) "
+        "VALUES(%s, %s, %s, %s, SHA2(%s, 256))",
+        admins,
+    )
+
+    estudiantes = [
+        (
+            f"Estudiante{i}",
+            f"Apellido{i % 997}",
+            f"2020{i:06d}",
+            f"est{i}@bench.upt.pe",
+            "999111111",
+            1 + i % 10,
+            PASSWORD_BENCH,
+        )
+        for i in range(args.estudiantes)
+    ]
+    _insertar(
+        cur,
+        "INSERT INTO estudiantes(nombres, apellidos, codigo_universitario, correo, numero_telefono, ciclo, contrasena_hash) "
+        "VALUES(%s, %s, %s, %s, %s, %s, SHA2(%s, 256))",
+        estudiantes,
+    )
+
+    concursos = []
+    for i in range(args.concursos):
+        creado = ahora - timedelta(days=args.concursos - i)
+        concursos.append((
+            f"Concurso {i}",
+            1 + i % args.admins,
+            creado + timedelta(days=30),
+            creado + timedelta(days=45),
+            creado + timedelta(days=60),
+            creado,
+        ))
+    _insertar(
+        cur,
+        "INSERT INTO concursos(nombre, administrador_id, fecha_limite_inscripcion, fecha_revision, "
+        "fecha_confirmacion_aceptados, fecha_creacion) VALUES(%s, %s, %s, %s, %s, %s)",
+        concursos,
+    )
+
+    categorias = [
+        (1 + c, f"Categoria {k}", f"{1 + k} a {2 + k} ciclo")
+        for c in range(args.concursos)
+        for k in range(args.categorias)
+    ]
+    _insertar(
+        cur,
+        "INSERT INTO categorias(concurso_id, nombre, rango_ciclos) VALUES(%s, %s, %s)",
+        categorias,
+    )
+
+    proyectos = []
+    for i in range(args.proyectos):
+        concurso = 1 + rnd.randrange(args.concursos)
+        categoria = (concurso - 1) * args.categorias + 1 + rnd.randrange(args.categorias)
+        estado = rnd.choice(ESTADOS)
+        proyectos.append((
+            " ".join(rnd.sample(PALABRAS, 3)).capitalize() + f" {i}",
+            f"https://github.com/bench/proyecto-{i}",
+            f"proyecto-{i}.zip",
+            1 + rnd.randrange(args.estudiantes),
+            concurso,
+            categoria,
+            ahora - timedelta(minutes=rnd.randrange(90 * 24 * 60)),
+            estado,
+            "Comentario de evaluación " * rnd.randrange(0, 8) or None,
+            round(rnd.uniform(0, 20), 2) if estado != "enviado" else None,
+        ))
+        if len(proyectos) >= LOTE * 10:
+            _insertar(cur, _SQL_PROYECTO, proyectos)
+            proyectos = []
+    _insertar(cur, _SQL_PROYECTO, proyectos)
+    cur.execute(SQL_RECONSTRUIR.format(filtro=""))
+
+    cnx.commit()
+    cur.execute("ANALYZE TABLE administradores, estudiantes, concursos, categorias, proyectos")
+    cur.fetchall()
+    cur.close()
+    cnx.close()
+    print(
+        f"Base `{args.database}` lista: {args.admins} admins, {args.estudiantes} estudiantes, "
+        f"{args.concursos} concursos, {args.concursos * args.categorias} categorías, "
+        f"{args.proyectos} proyectos"
+    )
+
+
+_SQL_PROYECTO = (
+    "INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id, "
+    "fecha_envio, estado, comentarios, puntuacion) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def argumentos_conexion(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default=os.getenv("DB_USER", "root"))
+    parser.add_argument("--password", default=os.getenv("DB_PASSWORD", ""))
+    parser.add_argument("--database", default="epis_bench")
+
+
+def forzar_entorno(args) -> None:
+    """Apunta `db` a la base de benchmark (antes de importar la app)."""
+    if "db" in sys.modules:
+        # `db` lee la configuración al importarse: ya apuntaría a producción
+        raise RuntimeError("forzar_entorno() debe llamarse antes de importar db")
+    os.environ["DB_HOST"] = args.host
+    os.environ["DB_PORT"] = str(args.port)
+    os.environ["DB_USER"] = args.user
+    os.environ["DB_PASSWORD"] = args.password
+    os.environ["DB_NAME"] = args.database
+    os.environ["DB_REPLICA_HOSTS"] = ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argumentos_conexion(parser)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--estudiantes", type=int, default=5000)
+    parser.add_argument("--concursos", type=int, default=50)
+    parser.add_argument("--categorias", type=int, default=10, help="categorías por concurso")
+    parser.add_argument("--proyectos", type=int, default=100000)
+    seed(parser.parse_args())
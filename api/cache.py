@@ -0,0 +1,165 @@
+"""
+Caché en memoria con TTL y desalojo LRU para lecturas que cambian poco
+(concursos, categorías y la identidad por correo de `by_email`).
+
+Las entradas se agrupan (p.ej. `("categorias", concurso_id)`) y las
+escrituras invalidan exactamente los grupos afectados con `invalidar()`.
+Cada grupo lleva un número de versión: una lectura que empezó antes de una
+invalidación no guarda su resultado, así no se reinstala un dato viejo.
+
+Con réplicas de lectura (`DB_REPLICA_HOSTS`), la primera carga de un grupo
+hasta `DB_STICKY_SECONDS` después de invalidarlo se lee del primario: una
+réplica atrasada guardaría bajo la versión nueva las filas de antes de la
+escritura durante todo el TTL.
+
+La caché es por proceso: con varios workers de uvicorn cada uno tiene la
+suya y `CACHE_TTL_SECONDS` acota cuánto puede tardar en verse un cambio
+hecho a través de otro worker. Las métricas se leen en
+`GET /admin/debug/cache`.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+import db
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# by_email se consulta en cada inicio de las apps: TTL corto (también para
+# los 404 cacheados) y espacio para todos los usuarios activos
+CACHE_IDENTIDAD_TTL_SECONDS = float(os.getenv("CACHE_IDENTIDAD_TTL_SECONDS", "30"))
+CACHE_IDENTIDAD_MAX_ENTRIES = int(os.getenv("CACHE_IDENTIDAD_MAX_ENTRIES", "10000"))
+
+_registro: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    def __init__(self, nombre: str, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.nombre = nombre
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (grupo, clave) -> (expira, valor), en orden de uso (el último es el más reciente)
+        self._datos: "OrderedDict[Tuple[Hashable, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._grupos: Dict[Hashable, Set[Hashable]] = {}
+        self._versiones: Dict[Hashable, int] = {}
+        # grupo -> momento de su última invalidación (solo dentro de la
+        # ventana de retraso de las réplicas)
+        self._invalidado_en: Dict[Hashable, float] = {}
+        self._limpiado_en = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._expiradas = 0
+        self._desalojadas = 0
+        self._invalidaciones = 0
+        _registro[nombre] = self
+
+    def version(self, grupo: Hashable) -> int:
+        with self._lock:
+            return self._versiones.get(grupo, 0)
+
+    def get(self, grupo: Hashable, clave: Hashable) -> Tuple[bool, Any]:
+        k = (grupo, clave)
+        with self._lock:
+            entrada = self._datos.get(k)
+            if entrada is not None:
+                if entrada[0] > time.monotonic():
+                    self._datos.move_to_end(k)
+                    self._hits += 1
+                    return True, entrada[1]
+                self._quitar(k)
+                self._expiradas += 1
+            self._misses += 1
+            return False, None
+
+    def set(self, grupo: Hashable, clave: Hashable, valor: Any, version: int) -> None:
+        """Guarda `valor` salvo que el grupo se haya invalidado desde `version`."""
+        k = (grupo, clave)
+        with self._lock:
+            if self._versiones.get(grupo, 0) != version:
+                return
+            self._datos[k] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(k)
+            self._grupos.setdefault(grupo, set()).add(clave)
+            while len(self._datos) > self.max_entries:
+                viejo = next(iter(self._datos))
+                self._quitar(viejo)
+                self._desalojadas += 1
+
+    async def get_or_load(self, grupo: Hashable, clave: Hashable, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        if not CACHE_ENABLED:
+            return await cargar()
+        version = self.version(grupo)
+        hit, valor = self.get(grupo, clave)
+        if hit:
+            return valor
+        if self._invalidado_hace_poco(grupo):
+            with db.leer_del_primario():
+                valor = await cargar()
+        else:
+            valor = await cargar()
+        self.set(grupo, clave, valor, version)
+        return valor
+
+    def _invalidado_hace_poco(self, grupo: Hashable) -> bool:
+        if not db.DB_REPLICA_HOSTS:
+            return False
+        limite = time.monotonic() - db.DB_STICKY_SECONDS
+        with self._lock:
+            return max(self._invalidado_en.get(grupo, 0.0), self._limpiado_en) > limite
+
+    def invalidar(self, *grupos: Hashable) -> None:
+        ahora = time.monotonic()
+        with self._lock:
+            for grupo in grupos:
+                self._versiones[grupo] = self._versiones.get(grupo, 0) + 1
+                for clave in self._grupos.pop(grupo, ()):
+                    self._datos.pop((grupo, clave), None)
+                self._invalidado_en[grupo] = ahora
+                self._invalidaciones += 1
+            if len(self._invalidado_en) > self.max_entries:
+                limite = ahora - db.DB_STICKY_SECONDS
+                self._invalidado_en = {g: t for g, t in self._invalidado_en.items() if t > limite}
+
+    def clear(self) -> None:
+        with self._lock:
+            for grupo in self._grupos:
+                self._versiones[grupo] = self._versiones.get(grupo, 0) + 1
+            self._datos.clear()
+            self._grupos.clear()
+            self._limpiado_en = time.monotonic()
+
+    def _quitar(self, k: Tuple[Hashable, Hashable]) -> None:
+        self._datos.pop(k, None)
+        claves = self._grupos.get(k[0])
+        if claves is not None:
+            claves.discard(k[1])
+            if not claves:
+                del self._grupos[k[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entradas": len(self._datos),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 3) if total else 0.0,
+                "expiradas": self._expiradas,
+                "desalojadas": self._desalojadas,
+                "invalidaciones": self._invalidaciones,
+            }
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": CACHE_ENABLED, "caches": {n: c.stats() for n, c in _registro.items()}}
+
+
+def clear() -> None:
+    for c in _registro.values():
+        c.clear()
@@ -0,0 +1,285 @@
+"""
+Subidas en segundo plano para `POST /proyectos/upload` (`SUBIDAS_ASYNC=1`).
+
+La petición solo copia el ZIP al directorio de spool (`SUBIDAS_DIR`),
+inserta el proyecto en estado `subiendo` y responde `202`. Un pool fijo de
+`SUBIDAS_WORKERS` hilos hace la subida a Graph; si falla se reintenta con
+backoff exponencial (`SUBIDAS_BACKOFF_SECONDS`, `SUBIDAS_MAX_INTENTOS`).
+
+Cada trabajo son dos archivos en el spool: `<id>.zip` y `<id>.json` (datos
+del proyecto, intentos y último error). Al arrancar se vuelven a encolar
+los `.json` que quedaron, así un reinicio o una caída no pierde envíos.
+Un trabajo se toma con `flock` sobre `<id>.lock`, abierto mientras dura
+la subida, de modo que varios workers de uvicorn pueden compartir el spool
+(el disco debe ser local: `flock` no es fiable en NFS). El kernel suelta
+el lock si el proceso muere, así que no hay locks huérfanos que limpiar.
+Un trabajo con `siguiente_intento` en el futuro no se toma antes de tiempo
+aunque lo encole otro proceso. Los trabajos que agotan sus intentos pasan
+a `<id>.fallida.json`/`.zip` hasta que se reintenten.
+"""
+import fcntl
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+logger = logging.getLogger("epis.subidas")
+
+SUBIDAS_ASYNC = os.getenv("SUBIDAS_ASYNC", "0") == "1"
+SUBIDAS_DIR = os.getenv("SUBIDAS_DIR", os.path.join(os.path.dirname(__file__), "spool_subidas"))
+SUBIDAS_WORKERS = int(os.getenv("SUBIDAS_WORKERS", "2"))
+SUBIDAS_MAX_INTENTOS = int(os.getenv("SUBIDAS_MAX_INTENTOS", "5"))
+SUBIDAS_BACKOFF_SECONDS = float(os.getenv("SUBIDAS_BACKOFF_SECONDS", "30"))
+# Con más trabajos pendientes la API responde 503 en lugar de llenar el disco
+SUBIDAS_PENDIENTES_MAX = int(os.getenv("SUBIDAS_PENDIENTES_MAX", "500"))
+
+_BLOQUE = 1024 * 1024
+# Temporales de peticiones que no llegaron a encolarse
+_TEMPORAL_MAX_EDAD = 3600
+_PENDIENTE = re.compile(r"^(\d+)\.json$")
+
+
+class ColaSubidas:
+    """
+    `procesar(meta, ruta_zip)` hace la subida y actualiza la base; si lanza
+    una excepción el trabajo se reintenta. `fallida(meta)` se llama una vez
+    cuando se agotan los intentos.
+    """
+
+    def __init__(
+        self,
+        procesar: Callable[[Dict[str, Any], str], None],
+        fallida: Callable[[Dict[str, Any]], None],
+        directorio: str = SUBIDAS_DIR,
+        workers: int = SUBIDAS_WORKERS,
+        max_intentos: int = SUBIDAS_MAX_INTENTOS,
+        backoff: float = SUBIDAS_BACKOFF_SECONDS,
+    ):
+        self.directorio = directorio
+        self.workers = workers
+        self.max_intentos = max_intentos
+        self.backoff = backoff
+        self._procesar = procesar
+        self._fallida = fallida
+        self._cola: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._hilos: List[threading.Thread] = []
+        self._timers: Dict[int, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._contadores = {"completadas": 0, "reintentos": 0, "fallidas": 0, "recuperadas": 0}
+
+    # --- archivos del spool ---------------------------------------------
+
+    def _ruta(self, proyecto_id: int, ext: str, fallida: bool = False) -> str:
+        return os.path.join(self.directorio, f"{proyecto_id}{'.fallida' if fallida else ''}.{ext}")
+
+    def _escribir_meta(self, meta: Dict[str, Any], fallida: bool = False) -> None:
+        ruta = self._ruta(meta["proyecto_id"], "json", fallida)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, ruta)
+
+    def leer_meta(self, proyecto_id: int) -> Optional[Dict[str, Any]]:
+        """Datos del trabajo pendiente o fallido (None si ya terminó o no existe)."""
+        for fallida in (False, True):
+            try:
+                with open(self._ruta(proyecto_id, "json", fallida), encoding="utf-8") as f:
+                    return dict(json.load(f), fallida=fallida)
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                return None
+        return None
+
+    def guardar_temporal(self, origen: BinaryIO) -> str:
+        """Copia el archivo subido al spool por bloques (nunca entero en memoria)."""
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f"tmp-{uuid.uuid4().hex}.part")
+        try:
+            with open(ruta, "wb") as f:
+                shutil.copyfileobj(origen, f, _BLOQUE)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            descartar(ruta)
+            raise
+        return ruta
+
+    def pendientes(self) -> int:
+        try:
+            return sum(1 for n in os.listdir(self.directorio) if _PENDIENTE.match(n))
+        except FileNotFoundError:
+            return 0
+
+    def encolar(self, proyecto_id: int, temporal: str, datos: Dict[str, Any]) -> None:
+        os.replace(temporal, self._ruta(proyecto_id, "zip"))
+        meta = dict(datos, proyecto_id=proyecto_id, intentos=0, error=None, siguiente_intento=None, creado=time.time())
+        self._escribir_meta(meta)
+        self._cola.put(proyecto_id)
+
+    def reintentar(self, proyecto_id: int) -> bool:
+        """Vuelve a encolar un trabajo fallido con los intentos a cero."""
+        meta = self.leer_meta(proyecto_id)
+        if meta is None or not meta["fallida"] or not os.path.exists(self._ruta(proyecto_id, "zip", True)):
+            return False
+        meta.update(intentos=0, error=None, siguiente_intento=None)
+        del meta["fallida"]
+        os.replace(self._ruta(proyecto_id, "zip", True), self._ruta(proyecto_id, "zip"))
+        self._escribir_meta(meta)
+        descartar(self._ruta(proyecto_id, "json", True))
+        self._cola.put(proyecto_id)
+        return True
+
+    # --- ciclo de vida --------------------------------------------------
+
+    def iniciar(self) -> None:
+        os.makedirs(self.directorio, exist_ok=True)
+        ahora = time.time()
+        for nombre in sorted(os.listdir(self.directorio)):
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre.startswith("tmp-") and ahora - os.path.getmtime(ruta) > _TEMPORAL_MAX_EDAD:
+                descartar(ruta)
+                continue
+            m = _PENDIENTE.match(nombre)
+            if m:
+                self._cola.put(int(m.group(1)))
+                self._contadores["recuperadas"] += 1
+        if self._contadores["recuperadas"]:
+            logger.info("Subidas recuperadas del spool: %d", self._contadores["recuperadas"])
+        for i in range(self.workers):
+            hilo = threading.Thread(target=self._worker, name=f"subidas-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self, timeout: float = 5.0) -> None:
+        # Lo que quede en curso o pendiente sigue en el spool para el próximo arranque
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos.clear()
+
+    def _worker(self) -> None:
+        while True:
+            proyecto_id = self._cola.get()
+            if proyecto_id is None:
+                return
+            try:
+                self._ejecutar(proyecto_id)
+            except Exception:
+                logger.exception("Error inesperado en la subida del proyecto %s", proyecto_id)
+
+    # --- ejecución ------------------------------------------------------
+
+    def _tomar(self, proyecto_id: int) -> Optional[int]:
+        """Descriptor con el lock exclusivo del trabajo, o None si otro lo tiene."""
+        fd = os.open(self._ruta(proyecto_id, "lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _ejecutar(self, proyecto_id: int) -> None:
+        fd = self._tomar(proyecto_id)
+        if fd is None:
+            return
+        try:
+            meta = self.leer_meta(proyecto_id)
+            ruta_zip = self._ruta(proyecto_id, "zip")
+            if meta is None:
+                # Ya terminó en otro worker; el .lock es el recreado por este open
+                descartar(self._ruta(proyecto_id, "lock"))
+                return
+            if meta["fallida"] or not os.path.exists(ruta_zip):
+                return
+            del meta["fallida"]
+            espera = (meta.get("siguiente_intento") or 0) - time.time()
+            if espera > 0:
+                # Encolado por otro proceso (o al arrancar) antes de su backoff
+                self._programar(proyecto_id, espera)
+                return
+            try:
+                self._procesar(meta, ruta_zip)
+            except Exception as e:
+                self._fallo(meta, e)
+                return
+            descartar(ruta_zip)
+            descartar(self._ruta(proyecto_id, "json"))
+            # Solo se borra sin trabajo pendiente: quien bloquee después el
+            # inodo viejo ya no encuentra el .json y no hace nada
+            descartar(self._ruta(proyecto_id, "lock"))
+            with self._lock:
+                self._contadores["completadas"] += 1
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _fallo(self, meta: Dict[str, Any], error: Exception) -> None:
+        proyecto_id = meta["proyecto_id"]
+        meta["intentos"] += 1
+        meta["error"] = str(error)[:500]
+        if meta["intentos"] >= self.max_intentos:
+            logger.warning("Subida del proyecto %s fallida tras %d intentos: %s", proyecto_id, meta["intentos"], error)
+            meta["siguiente_intento"] = None
+            self._escribir_meta(meta, fallida=True)
+            os.replace(self._ruta(proyecto_id, "zip"), self._ruta(proyecto_id, "zip", True))
+            descartar(self._ruta(proyecto_id, "json"))
+            with self._lock:
+                self._contadores["fallidas"] += 1
+            try:
+                self._fallida(meta)
+            except Exception:
+                logger.exception("No se pudo marcar como fallida la subida del proyecto %s", proyecto_id)
+            return
+
+        espera = self.backoff * (2 ** (meta["intentos"] - 1))
+        meta["siguiente_intento"] = time.time() + espera
+        self._escribir_meta(meta)
+        logger.info("Subida del proyecto %s falló (intento %d), reintento en %.0fs: %s",
+                    proyecto_id, meta["intentos"], espera, error)
+        with self._lock:
+            self._contadores["reintentos"] += 1
+        self._programar(proyecto_id, espera)
+
+    def _programar(self, proyecto_id: int, espera: float) -> None:
+        timer = threading.Timer(espera, self._reencolar, (proyecto_id,))
+        timer.daemon = True
+        with self._lock:
+            anterior = self._timers.pop(proyecto_id, None)
+            if anterior is not None:
+                anterior.cancel()
+            self._timers[proyecto_id] = timer
+        timer.start()
+
+    def _reencolar(self, proyecto_id: int) -> None:
+        with self._lock:
+            self._timers.pop(proyecto_id, None)
+        self._cola.put(proyecto_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._contadores,
+                "pendientes": self.pendientes(),
+                "en_espera_de_reintento": len(self._timers),
+                "workers": len(self._hilos),
+            }
+
+
+def descartar(ruta: str) -> None:
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
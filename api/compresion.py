@@ -0,0 +1,148 @@
+"""
+Compresión de respuestas (brotli si está instalado, si no gzip).
+
+Se negocia con `Accept-Encoding` y solo se comprimen respuestas de tipos
+de texto/datos (`application/json`, NDJSON, MessagePack, `text/*`) a partir
+de `COMPRESION_MIN_BYTES`; por debajo el ahorro no compensa la CPU. En
+streaming (NDJSON) cada bloque se vacía con sync-flush para que el cliente
+reciba las filas sin esperar al final.
+
+Los niveles por defecto salen de `benchmarks.bench_compresion`: gzip 6 y
+brotli 4 comprimen casi como los máximos con una fracción de la CPU.
+"""
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se usa solo gzip
+    brotli = None
+
+COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+COMPRESION_GZIP_NIVEL = int(os.getenv("COMPRESION_GZIP_NIVEL", "6"))
+COMPRESION_BR_CALIDAD = int(os.getenv("COMPRESION_BR_CALIDAD", "4"))
+
+_COMPRIMIBLES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+
+
+def calidades(cabecera: str) -> Dict[str, float]:
+    """Valores de un header `Accept*` con su `q` (1.0 si no se indica)."""
+    resultado: Dict[str, float] = {}
+    for parte in cabecera.lower().split(","):
+        nombre, *params = parte.split(";")
+        nombre = nombre.strip()
+        if not nombre:
+            continue
+        q = 1.0
+        for param in params:
+            clave, _, valor = param.partition("=")
+            if clave.strip() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        resultado[nombre] = max(q, resultado.get(nombre, 0.0))
+    return resultado
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """`br` o `gzip` según lo que acepte el cliente (respetando `q=0`)."""
+    aceptadas = {nombre for nombre, q in calidades(accept_encoding).items() if q > 0}
+    if brotli is not None and "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas:
+        return "gzip"
+    return None
+
+
+class Compresor:
+    def __init__(self, codificacion: str, nivel_gzip: int = COMPRESION_GZIP_NIVEL, calidad_br: int = COMPRESION_BR_CALIDAD):
+        self.codificacion = codificacion
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=calidad_br)
+        else:
+            # wbits=31: formato gzip (cabecera y CRC)
+            self._gz = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 31)
+
+    def comprimir(self, data: bytes, final: bool) -> bytes:
+        if self.codificacion == "br":
+            return self._br.process(data) + (self._br.finish() if final else self._br.flush())
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompresionMiddleware:
+    def __init__(self, app: ASGIApp, minimo: int = COMPRESION_MIN_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        await _Respuesta(self.app, codificacion, self.minimo)(scope, receive, send)
+
+
+class _Respuesta:
+    """Retiene el `http.response.start` hasta ver el primer bloque del cuerpo."""
+
+    def __init__(self, app: ASGIApp, codificacion: str, minimo: int):
+        self.app = app
+        self.codificacion = codificacion
+        self.minimo = minimo
+        self.send: Send = None
+        self.inicio: Message = {}
+        self.compresor: Optional[Compresor] = None
+        self.directo = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self._enviar)
+
+    async def _enviar(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.inicio = message
+            headers = Headers(raw=message["headers"])
+            tipo = headers.get("content-type", "")
+            self.directo = "content-encoding" in headers or not tipo.startswith(_COMPRIMIBLES)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.inicio:
+            inicio, self.inicio = self.inicio, {}
+            if self.directo or (not more_body and len(body) < self.minimo):
+                self.directo = True
+                await self.send(inicio)
+                await self.send(message)
+                return
+            self.compresor = Compresor(self.codificacion)
+            headers = MutableHeaders(raw=inicio["headers"])
+            headers["Content-Encoding"] = self.codificacion
+            headers.add_vary_header("Accept-Encoding")
+            del headers["Content-Length"]
+            body = self.compresor.comprimir(body, final=not more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await self.send(inicio)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.directo:
+            await self.send(message)
+            return
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compresor.comprimir(body, final=not more_body),
+            "more_body": more_body,
+        })
@@ -0,0 +1,47 @@
+"""
+GET condicionales (ETag / If-None-Match) para los listados que los
+clientes consultan periódicamente.
+
+Cada listado define una "huella" barata de su colección (p.ej. `COUNT(*)`,
+`MAX(id)` y las últimas modificaciones, resueltos sobre índices). El ETag
+se deriva de la huella y de la variante pedida (query string y `Accept`),
+así que si el cliente ya tiene esa versión se responde `304` sin ejecutar
+la consulta completa ni serializar nada.
+
+No se envía `Last-Modified` ni se evalúa `If-Modified-Since`: en una
+colección la fecha máxima no cambia al borrar una fila y tiene precisión
+de segundos, así que un cliente que solo enviara esa cabecera recibiría
+`304` con datos viejos. La huella completa solo viaja en el ETag.
+"""
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+
+def _etag(huella: Dict[str, Any], variante: str) -> str:
+    base = "|".join(str(huella[k]) for k in sorted(huella)) + "|" + variante
+    # Débil: la misma versión puede enviarse comprimida o no
+    return 'W/"' + hashlib.blake2b(base.encode(), digest_size=12).hexdigest() + '"'
+
+
+def _coincide_etag(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaco = etag[2:]
+    return any(t.strip().removeprefix("W/") == opaco for t in if_none_match.split(","))
+
+
+def verificar(request: Request, huella: Dict[str, Any]) -> Tuple[Optional[Response], Dict[str, str]]:
+    """
+    Devuelve `(respuesta_304, cabeceras)`. Si la primera no es None el
+    router la retorna tal cual; si no, agrega las cabeceras a su respuesta.
+    """
+    variante = f"{request.url.query}|{request.headers.get('accept', '')}"
+    etag = _etag(huella, variante)
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _coincide_etag(if_none_match, etag):
+        return Response(status_code=304, headers=cabeceras), cabeceras
+    return None, cabeceras
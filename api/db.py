@@ -1,8 +1,17 @@
 import os
+import re
+import threading
+import time
+import itertools
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 import mysql.connector
-from mysql.connector import pooling
 from dotenv import load_dotenv
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import db_profile
+from db_pool import Pool
 
 load_dotenv()
 
@@ -11,36 +20,391 @@ DB_PORT = int(os.getenv("DB_PORT", "3306"))
 DB_USER = os.getenv("DB_USER", "admin")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "Upt2025")
 DB_NAME = os.getenv("DB_NAME", "epis_proyectos")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+# Hilos del executor de db_async: por encima de la capacidad del pool para
+# que los excedentes esperen en la cola del pool (con timeout) y no sin límite
+DB_EXECUTOR_WORKERS = int(
+    os.getenv("DB_EXECUTOR_WORKERS", str(2 * (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)))
+)
+DB_STREAM_BATCH = int(os.getenv("DB_STREAM_BATCH", "500"))
+DB_BULK_BATCH = int(os.getenv("DB_BULK_BATCH", "500"))
+
+# Réplicas de lectura: "host" o "host:puerto" separados por comas
+DB_REPLICA_HOSTS = [h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", str(DB_POOL_SIZE)))
+# Segundos que una réplica caída queda fuera de rotación antes de reintentarla
+DB_REPLICA_RETRY = float(os.getenv("DB_REPLICA_RETRY", "30"))
+# Tras escribir, un cliente lee del primario durante esta ventana (read-your-writes)
+DB_STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", "5"))
+# Sentencias preparadas del servidor en `query_named`. Apagadas por defecto:
+# mysql-connector envía COM_STMT_RESET antes de cada ejecución, un viaje
+# extra que contra una base remota cuesta más que el parseo que se ahorra
+DB_PREPARED = os.getenv("DB_PREPARED", "0") == "1"
+
+T = TypeVar("T")
+
+_RE_VALUES = re.compile(r"\bVALUES\s*(\(.*\))\s*$", re.IGNORECASE | re.DOTALL)
+
+
+
+def _multi_fila(sql: str) -> Tuple[str, str]:
+    """Separa `INSERT ... VALUES(...)` en el prefijo y el grupo de una fila."""
+    m = _RE_VALUES.search(sql)
+    if not m:
+        raise ValueError("insert_many requiere un INSERT ... VALUES(...)")
+    return sql[: m.start(1)], m.group(1)
+
+def _paso_autoincremento(cur) -> int:
+    # Galera y la replicación multi-primario usan auto_increment_increment > 1
+    cur.execute("SELECT @@SESSION.auto_increment_increment")
+    return int(cur.fetchone()[0] or 1)
 
-_pool: pooling.MySQLConnectionPool | None = None
 
+def _ids_generados(primero: int, filas: int, paso: int) -> List[int]:
+    # Un INSERT ... VALUES de varias filas es un "simple insert": InnoDB le
+    # reserva todos los ids de una vez (cualquier innodb_autoinc_lock_mode),
+    # así que son consecutivos con paso auto_increment_increment a partir de
+    # LAST_INSERT_ID(). No vale para INSERT ... SELECT ni con ids explícitos.
+    return list(range(primero, primero + filas * paso, paso))
 
-def _init_pool() -> pooling.MySQLConnectionPool:
+_pool: Pool | None = None
+_init_lock = threading.Lock()
+
+
+def _init_pool() -> Pool:
     global _pool
     if _pool is None:
-        _pool = pooling.MySQLConnectionPool(
-            pool_name="epis_pool",
-            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
-            host=DB_HOST,
-            port=DB_PORT,
+        with _init_lock:
+            if _pool is None:
+                _pool = Pool(
+                    size=DB_POOL_SIZE,
+                    max_overflow=DB_POOL_MAX_OVERFLOW,
+                    timeout=DB_POOL_TIMEOUT,
+                    recycle=DB_POOL_RECYCLE,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    database=DB_NAME,
+                    autocommit=False,
+                )
+    return _pool
+
+
+def get_connection():
+    """Conexión al primario (escrituras, transacciones y lecturas sticky)."""
+    return _init_pool().get_connection()
+
+
+def pool_stats() -> Dict[str, Any]:
+    return _init_pool().stats()
+
+
+# --- Réplicas de lectura -------------------------------------------------
+
+class _Replica:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.caida_hasta = 0.0
+        self.pool = Pool(
+            size=DB_REPLICA_POOL_SIZE,
+            max_overflow=0,
+            # Si la réplica está saturada se lee del primario en vez de esperar
+            timeout=0.05,
+            recycle=DB_POOL_RECYCLE,
+            host=host,
+            port=port,
             user=DB_USER,
             password=DB_PASSWORD,
             database=DB_NAME,
             autocommit=False,
         )
-    return _pool
 
 
-def get_connection():
-    return _init_pool().get_connection()
+_replicas: List[_Replica] | None = None
+_turno = itertools.count()
 
+# Cliente HTTP actual (lo fija el middleware de main.py) y momento de su
+# última escritura, para leer del primario justo después de escribir
+_cliente: ContextVar[Optional[str]] = ContextVar("db_cliente", default=None)
+_ultima_escritura: "OrderedDict[str, float]" = OrderedDict()
+_escrituras_lock = threading.Lock()
+_MAX_CLIENTES = 10000
 
-def query(sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+
+def set_client(cliente: Optional[str]) -> Token:
+    return _cliente.set(cliente)
+
+
+def reset_client(token: Token) -> None:
+    _cliente.reset(token)
+
+
+def _marcar_escritura() -> None:
+    cliente = _cliente.get()
+    if not cliente or not DB_REPLICA_HOSTS:
+        return
+    with _escrituras_lock:
+        _ultima_escritura[cliente] = time.monotonic()
+        _ultima_escritura.move_to_end(cliente)
+        while len(_ultima_escritura) > _MAX_CLIENTES:
+            _ultima_escritura.popitem(last=False)
+
+
+# Lecturas forzadas al primario (ver `leer_del_primario`)
+_solo_primario: ContextVar[bool] = ContextVar("db_solo_primario", default=False)
+
+
+@contextmanager
+def leer_del_primario() -> Iterator[None]:
+    """Las lecturas dentro del bloque van al primario aunque haya réplicas."""
+    token = _solo_primario.set(True)
+    try:
+        yield
+    finally:
+        _solo_primario.reset(token)
+
+
+def _escribio_hace_poco() -> bool:
+    cliente = _cliente.get()
+    if not cliente:
+        return False
+    t = _ultima_escritura.get(cliente)
+    return t is not None and time.monotonic() - t < DB_STICKY_SECONDS
+
+
+def _init_replicas() -> List[_Replica]:
+    global _replicas
+    if _replicas is None:
+        with _init_lock:
+            if _replicas is None:
+                replicas = []
+                for h in DB_REPLICA_HOSTS:
+                    host, _, port = h.partition(":")
+                    replicas.append(_Replica(host, int(port or DB_PORT)))
+                _replicas = replicas
+    return _replicas
+
+
+def _conexion_lectura() -> Tuple[Any, Optional[_Replica]]:
+    """Conexión de lectura y la réplica de la que viene (None si es el primario)."""
+    replicas = _init_replicas()
+    if not replicas or _solo_primario.get() or _escribio_hace_poco():
+        return get_connection(), None
+    ahora = time.monotonic()
+    inicio = next(_turno)
+    for i in range(len(replicas)):
+        r = replicas[(inicio + i) % len(replicas)]
+        if r.caida_hasta > ahora:
+            continue
+        try:
+            return r.pool.get_connection(), r
+        except mysql.connector.errors.PoolError:
+            continue
+        except mysql.connector.Error:
+            r.caida_hasta = ahora + DB_REPLICA_RETRY
+    return get_connection(), None
+
+
+def get_read_connection():
+    """
+    Conexión para lecturas: una réplica sana en round-robin, o el primario
+    si no hay réplicas, todas están caídas o el cliente escribió hace poco.
+    Una réplica que falla al conectar sale de rotación `DB_REPLICA_RETRY`
+    segundos. Dentro de `leer_del_primario()` siempre se usa el primario.
+    """
+    return _conexion_lectura()[0]
+
+
+# Errores de la conexión (caída, "gone away", timeout), no de la sentencia:
+# un error de SQL fallaría igual en el primario
+_ERRORES_DE_CONEXION = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+
+def _leer(lectura: Callable[[Any], T]) -> T:
+    """
+    Ejecuta `lectura(conn)` (que cierra la conexión) en una conexión de
+    lectura. Si la de una réplica se cae a mitad, la réplica sale de
+    rotación y la lectura se repite una sola vez en el primario.
+    """
+    conn, replica = _conexion_lectura()
+    try:
+        return lectura(conn)
+    except _ERRORES_DE_CONEXION:
+        if replica is None:
+            raise
+        replica.caida_hasta = time.monotonic() + DB_REPLICA_RETRY
+    return lectura(get_connection())
+
+
+def replicas_stats() -> List[Dict[str, Any]]:
+    ahora = time.monotonic()
+    return [
+        {
+            "host": f"{r.host}:{r.port}",
+            "sana": r.caida_hasta <= ahora,
+            "pool": r.pool.stats(),
+        }
+        for r in _init_replicas()
+    ]
+
+
+class Transaccion:
+    """
+    Conexión compartida por varias sentencias dentro de `transaction()`.
+    Expone la misma API que el módulo (`query`, `execute`, `insert`) pero sin
+    commit por sentencia.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        cur = self._conn.cursor(dictionary=True)
+        try:
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            db_profile.registrar(sql, params, t0, len(rows), self._conn)
+            return rows
+        finally:
+            cur.close()
+
+    def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> int:
+        cur = self._conn.cursor()
+        try:
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            db_profile.registrar(sql, params, t0, cur.rowcount)
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    def insert(self, sql: str, params: Tuple[Any, ...] = ()) -> int:
+        cur = self._conn.cursor()
+        try:
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            db_profile.registrar(sql, params, t0, cur.rowcount)
+            return int(cur.lastrowid or 0)
+        finally:
+            cur.close()
+
+    def insert_many(
+        self, sql: str, rows: Sequence[Tuple[Any, ...]], batch_size: int = DB_BULK_BATCH
+    ) -> List[int]:
+        """Como `db.insert_many` pero sin commit: todos los lotes o ninguno."""
+        ids: List[int] = []
+        if not rows:
+            return ids
+        prefijo, fila = _multi_fila(sql)
+        cur = self._conn.cursor()
+        try:
+            paso = _paso_autoincremento(cur)
+            for i in range(0, len(rows), batch_size):
+                lote = rows[i : i + batch_size]
+                t0 = time.perf_counter()
+                cur.execute(prefijo + ", ".join([fila] * len(lote)), tuple(v for row in lote for v in row))
+                db_profile.registrar(sql, (), t0, len(lote))
+                ids.extend(_ids_generados(int(cur.lastrowid or 0), len(lote), paso))
+            return ids
+        finally:
+            cur.close()
+
+
+@contextmanager
+def transaction() -> Iterator[Transaccion]:
+    """
+    Toma una sola conexión del pool para varias sentencias y hace un único
+    commit al salir del bloque; cualquier excepción (incluida una
+    HTTPException) revierte todo.
+
+        with transaction() as tx:
+            if tx.query("SELECT ...", (...,)):
+                ...
+            nuevo_id = tx.insert("INSERT ...", (...))
+    """
     conn = get_connection()
+    try:
+        yield Transaccion(conn)
+        conn.commit()
+        _marcar_escritura()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# --- Consultas con nombre (sentencias preparadas) ------------------------
+
+_consultas: Dict[str, str] = {}
+
+
+def register_query(key: str, sql: str) -> str:
+    """
+    Registra una consulta frecuente bajo `key` para `query_named(key)`. Con
+    `DB_PREPARED=1` se ejecuta como sentencia preparada del servidor,
+    cacheada por conexión del pool (se prepara una vez por conexión); si no,
+    como texto igual que `query`.
+    """
+    _consultas[key] = sql
+    return key
+
+
+def named_sql(key: str) -> str:
+    return _consultas[key]
+
+
+def query_named(key: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+    if not DB_PREPARED:
+        sql = _consultas[key]
+        return _leer(lambda conn: _query(conn, sql, params))
+    return _leer(lambda conn: _query_named(conn, key, params))
+
+
+def _query_named(conn, key: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    sql = _consultas[key]
+    try:
+        cache = conn.statement_cache
+        cur = cache.get(key)
+        if cur is None:
+            cur = conn.cursor(prepared=True, dictionary=True)
+            cache[key] = cur
+        try:
+            # El cursor reutiliza la sentencia preparada si recibe el mismo
+            # objeto `sql` que en la ejecución anterior
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            db_profile.registrar(sql, params, t0, len(rows), conn)
+            return rows
+        except mysql.connector.Error:
+            cache.pop(key, None)
+            try:
+                cur.close()
+            except Exception:
+                pass
+            raise
+    finally:
+        conn.close()
+
+
+def query(sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+    return _leer(lambda conn: _query(conn, sql, params))
+
+
+def _query(conn, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
     try:
         cur = conn.cursor(dictionary=True)
+        t0 = time.perf_counter()
         cur.execute(sql, params)
         rows = cur.fetchall()
+        db_profile.registrar(sql, params, t0, len(rows), conn)
         return rows
     finally:
         try:
@@ -50,12 +414,80 @@ def query(sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
         conn.close()
 
 
+def query_iter(
+    sql: str, params: Tuple[Any, ...] = (), batch_size: int = DB_STREAM_BATCH
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Igual que `query` pero con un cursor sin buffer: las filas se leen del
+    servidor por lotes de `batch_size` y se entregan lote a lote, así la
+    memoria no crece con el tamaño del resultado. La conexión queda tomada
+    hasta que el generador se agota o se cierra. Si la réplica falla antes
+    del primer lote se lee del primario, como en `query`; después ya no,
+    porque el cliente recibió parte de las filas.
+    """
+    conn, replica = _conexion_lectura()
+    lotes = _lotes(conn, sql, params, batch_size)
+    try:
+        primero = next(lotes, None)
+    except _ERRORES_DE_CONEXION:
+        if replica is None:
+            raise
+        replica.caida_hasta = time.monotonic() + DB_REPLICA_RETRY
+        lotes = _lotes(get_connection(), sql, params, batch_size)
+        primero = next(lotes, None)
+    try:
+        if primero is not None:
+            yield primero
+            yield from lotes
+    finally:
+        lotes.close()
+
+
+def _lotes(conn, sql: str, params: Tuple[Any, ...], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    terminado = False
+    try:
+        cur = conn.cursor(dictionary=True, buffered=False)
+        t0 = time.perf_counter()
+        filas = 0
+        cur.execute(sql, params)
+        # Solo el tiempo en la base: lo que tarda el cliente en leer cada
+        # lote (entre yields) no cuenta, si no un cliente lento llenaría el
+        # log de consultas lentas con listados normales
+        en_base = time.perf_counter() - t0
+        while True:
+            t = time.perf_counter()
+            rows = cur.fetchmany(batch_size)
+            en_base += time.perf_counter() - t
+            if not rows:
+                break
+            filas += len(rows)
+            yield rows
+        terminado = True
+        db_profile.registrar(sql, params, time.perf_counter() - en_base, filas)
+    finally:
+        if not terminado:
+            # Cerrado antes de tiempo: descartar lo que quede sin leer para
+            # que la conexión vuelva limpia al pool
+            try:
+                conn.consume_results()
+            except Exception:
+                pass
+        try:
+            cur.close()  # type: ignore
+        except Exception:
+            pass
+        conn.close()
+
+
 def execute(sql: str, params: Tuple[Any, ...] = ()) -> int:
     conn = get_connection()
     try:
         cur = conn.cursor()
+        t0 = time.perf_counter()
         cur.execute(sql, params)
         conn.commit()
+        db_profile.registrar(sql, params, t0, cur.rowcount)
+        _marcar_escritura()
         return cur.rowcount
     finally:
         try:
@@ -69,12 +501,60 @@ def insert(sql: str, params: Tuple[Any, ...] = ()) -> int:
     conn = get_connection()
     try:
         cur = conn.cursor()
+        t0 = time.perf_counter()
         cur.execute(sql, params)
         conn.commit()
+        db_profile.registrar(sql, params, t0, cur.rowcount)
+        _marcar_escritura()
         return int(cur.lastrowid or 0)
     finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+def insert_many(
+    sql: str, rows: Sequence[Tuple[Any, ...]], batch_size: int = DB_BULK_BATCH
+) -> List[int]:
+    """
+    Inserta varias filas con un INSERT multi-fila por lote: un round trip y
+    un commit cada `batch_size` filas. `sql` es el mismo
+    `INSERT ... VALUES(%s, ...)` que se usaría con `insert`.
+
+    Retorna los ids generados en el orden de `rows`: InnoDB asigna a las
+    filas de un mismo INSERT multi-fila ids consecutivos con paso
+    `auto_increment_increment` (ver `_ids_generados`). Si un lote falla se
+    revierte solo ese lote; los anteriores ya quedaron confirmados. Para
+    todo o nada, usar `transaction()` y `tx.insert_many`.
+    """
+    prefijo, fila = _multi_fila(sql)
+    ids: List[int] = []
+    if not rows:
+        return ids
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        paso = _paso_autoincremento(cur)
+        for i in range(0, len(rows), batch_size):
+            lote = rows[i : i + batch_size]
+            t0 = time.perf_counter()
+            cur.execute(
+                prefijo + ", ".join([fila] * len(lote)),
+                tuple(v for row in lote for v in row),
+            )
+            conn.commit()
+            db_profile.registrar(sql, (), t0, len(lote))
+            _marcar_escritura()
+            ids.extend(_ids_generados(int(cur.lastrowid or 0), len(lote), paso))
+        return ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        conn.close()
@@ -0,0 +1,105 @@
+"""
+Versión asíncrona de la API de `db.py` para los routers.
+
+Cada llamada se ejecuta en un executor dedicado (`DB_EXECUTOR_WORKERS`
+hilos): las rutas `async def` esperan a MySQL sin ocupar el threadpool de
+FastAPI. Los hilos que no consiguen conexión esperan en la cola del pool
+hasta `DB_POOL_TIMEOUT`, y el resto de peticiones en el event loop. Los
+helpers síncronos de `db.py` se mantienen para scripts.
+
+Para varias sentencias en una transacción, escribir una función síncrona
+que use `db.transaction()` y ejecutarla con `await run(funcion, ...)`: así
+la conexión y el hilo se toman juntos una sola vez.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import db
+
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=db.DB_EXECUTOR_WORKERS,
+            thread_name_prefix="epis_db",
+        )
+    return _executor
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Ejecuta una función síncrona que usa `db` en el executor de BD."""
+    loop = asyncio.get_running_loop()
+    # Copiar el contexto para que el hilo vea el cliente actual (réplicas)
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(ctx.run, fn, *args, **kwargs)
+    )
+
+
+async def query(sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+    return await run(db.query, sql, params)
+
+
+async def query_named(key: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+    return await run(db.query_named, key, params)
+
+
+def _cerrar_iter(it: Iterator[Any], en_curso: Optional["Future[Any]"]) -> None:
+    # Cerrar un generador que sigue ejecutándose en otro hilo lanza
+    # ValueError y deja el cursor y la conexión tomados hasta el GC
+    if en_curso is not None:
+        wait([en_curso])
+    it.close()
+
+
+async def query_iter(
+    sql: str, params: Tuple[Any, ...] = (), batch_size: int = db.DB_STREAM_BATCH
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Versión asíncrona de `db.query_iter`: cada lote se lee en el executor."""
+    executor = _get_executor()
+    ctx = contextvars.copy_context()
+    it = db.query_iter(sql, params, batch_size)
+    en_curso: Optional["Future[Any]"] = None
+    try:
+        while True:
+            en_curso = executor.submit(ctx.run, next, it, None)
+            rows = await asyncio.wrap_future(en_curso)
+            en_curso = None
+            if rows is None:
+                break
+            yield rows
+    finally:
+        # Si el cliente se desconecta a mitad de un lote la tarea se cancela
+        # con `next` aún corriendo: el cierre espera a que termine, en el
+        # executor y protegido de una segunda cancelación
+        cierre = executor.submit(ctx.copy().run, _cerrar_iter, it, en_curso)
+        await asyncio.shield(asyncio.wrap_future(cierre))
+
+
+async def execute(sql: str, params: Tuple[Any, ...] = ()) -> int:
+    return await run(db.execute, sql, params)
+
+
+async def insert(sql: str, params: Tuple[Any, ...] = ()) -> int:
+    return await run(db.insert, sql, params)
+
+
+async def insert_many(
+    sql: str, rows: Sequence[Tuple[Any, ...]], batch_size: int = db.DB_BULK_BATCH
+) -> List[int]:
+    return await run(db.insert_many, sql, rows, batch_size)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
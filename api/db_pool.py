@@ -0,0 +1,226 @@
+"""
+Pool de conexiones MySQL con cola de espera, conexiones de desborde
+(overflow) y métricas.
+
+A diferencia de `MySQLConnectionPool`, que lanza error apenas se agota,
+`get_connection()` espera hasta `timeout` segundos a que se libere una
+conexión y, si se configura `max_overflow`, abre conexiones temporales que
+se cierran al devolverse. Las métricas (`stats()`) se exponen en
+`GET /health/db` para dimensionar el pool con datos.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+class PoolTimeout(PoolError):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+class PooledConnection:
+    """Envuelve una conexión del pool; `close()` la devuelve al pool."""
+
+    def __init__(self, pool: "Pool", cnx, creada: float):
+        self._pool = pool
+        self._cnx = cnx
+        self._creada = creada
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cnx, name)
+
+    @property
+    def statement_cache(self) -> Dict[str, Any]:
+        """
+        Caché ligada a la conexión física (sobrevive entre checkouts). Se
+        descarta si la conexión se reconectó, porque las sentencias
+        preparadas del servidor se pierden con la sesión.
+        """
+        cnx = self._cnx
+        conn_id = cnx.connection_id
+        cache = getattr(cnx, "_epis_stmts", None)
+        if cache is None or cache[0] != conn_id:
+            cache = (conn_id, {})
+            cnx._epis_stmts = cache
+        return cache[1]
+
+    def close(self) -> None:
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool._release(cnx, self._creada)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(len(orden) * p))]
+
+
+class Pool:
+    def __init__(
+        self,
+        size: int,
+        max_overflow: int = 0,
+        timeout: float = 10.0,
+        recycle: float = 3600.0,
+        ping_after: float = 30.0,
+        **connect_args: Any,
+    ):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._connect_args = connect_args
+
+        self._cond = threading.Condition()
+        # (conexión, creada, devuelta) de las conexiones libres
+        self._idle: Deque[Tuple[Any, float, float]] = deque()
+        self._abiertas: Dict[int, float] = {}
+        self._total = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._overflow_abiertas = 0
+        self._creadas = 0
+        self._espera_max = 0.0
+        self._checkout_max = 0.0
+        self._latencias: Deque[float] = deque(maxlen=1000)
+        self._tiempos_espera: Deque[float] = deque(maxlen=1000)
+
+    def _connect(self):
+        cnx = mysql.connector.connect(**self._connect_args)
+        return cnx, time.monotonic()
+
+    def get_connection(self) -> PooledConnection:
+        t0 = time.monotonic()
+        espero = False
+        with self._cond:
+            while not self._idle and self._total >= self.size + self.max_overflow:
+                restante = self.timeout - (time.monotonic() - t0)
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Pool agotado: sin conexión libre tras {self.timeout:.1f}s"
+                    )
+                espero = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._waiting -= 1
+            espera = time.monotonic() - t0 if espero else 0.0
+            if self._idle:
+                cnx, creada, devuelta = self._idle.pop()
+            else:
+                cnx, creada, devuelta = None, 0.0, 0.0
+                self._total += 1
+                if self._total > self.size:
+                    self._overflow_abiertas += 1
+            self._in_use += 1
+
+        try:
+            ahora = time.monotonic()
+            if cnx is not None and ahora - creada > self.recycle:
+                self._cerrar(cnx, creada)
+                cnx = None
+            elif cnx is not None and ahora - devuelta > self.ping_after:
+                cnx.ping(reconnect=True, attempts=1)
+            if cnx is None:
+                cnx, creada = self._connect()
+                with self._cond:
+                    self._abiertas[id(cnx)] = creada
+                    self._creadas += 1
+        except Exception:
+            if cnx is not None:
+                # Ping fallido: la conexión muerta no vuelve al pool
+                self._cerrar(cnx, creada)
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        dt = time.monotonic() - t0
+        with self._cond:
+            self._checkouts += 1
+            self._latencias.append(dt)
+            self._checkout_max = max(self._checkout_max, dt)
+            if espero:
+                self._esperas += 1
+                self._tiempos_espera.append(espera)
+                self._espera_max = max(self._espera_max, espera)
+        return PooledConnection(self, cnx, creada)
+
+    def _cerrar(self, cnx, creada: float) -> None:
+        with self._cond:
+            self._abiertas.pop(id(cnx), None)
+        try:
+            cnx.close()
+        except Exception:
+            pass
+
+    def _release(self, cnx, creada: float) -> None:
+        reutilizable = True
+        try:
+            # Descartar el snapshot de lectura de una transacción sin commit
+            if cnx.in_transaction:
+                cnx.rollback()
+        except Exception:
+            reutilizable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if not reutilizable or self._total > self.size:
+                # Conexión rota o de desborde: se cierra en lugar de volver
+                self._total -= 1
+                cerrar = True
+            else:
+                self._idle.append((cnx, creada, time.monotonic()))
+                cerrar = False
+            self._cond.notify()
+        if cerrar:
+            self._cerrar(cnx, creada)
+
+    def stats(self) -> Dict[str, Any]:
+        ahora = time.monotonic()
+        with self._cond:
+            edades = [ahora - c for c in self._abiertas.values()]
+            latencias = list(self._latencias)
+            esperas = list(self._tiempos_espera)
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "timeout_s": self.timeout,
+                "abiertas": self._total,
+                "en_uso": self._in_use,
+                "libres": len(self._idle),
+                "esperando": self._waiting,
+                "checkouts": self._checkouts,
+                "checkout_ms": {
+                    "p50": round(_percentil(latencias, 0.50) * 1000, 2),
+                    "p95": round(_percentil(latencias, 0.95) * 1000, 2),
+                    "p99": round(_percentil(latencias, 0.99) * 1000, 2),
+                    "max": round(self._checkout_max * 1000, 2),
+                },
+                "esperas": self._esperas,
+                "espera_ms": {
+                    "p50": round(_percentil(esperas, 0.50) * 1000, 2),
+                    "p95": round(_percentil(esperas, 0.95) * 1000, 2),
+                    "max": round(self._espera_max * 1000, 2),
+                },
+                "agotado": self._timeouts,
+                "overflow_abiertas": self._overflow_abiertas,
+                "conexiones_creadas": self._creadas,
+                "edad_conexion_s": {
+                    "min": round(min(edades), 1) if edades else 0.0,
+                    "max": round(max(edades), 1) if edades else 0.0,
+                },
+            }
@@ -0,0 +1,145 @@
+"""
+Perfilado de consultas: tiempo, filas y ruta HTTP de cada sentencia.
+
+`db.py` llama a `registrar()` después de cada sentencia. Se guardan
+agregados por (ruta, SQL) y un log rotativo de consultas lentas (sobre
+`DB_SLOW_QUERY_MS`), opcionalmente con su `EXPLAIN`. Todo se lee desde
+`GET /admin/debug/queries` y se emite como logs JSON en el logger
+`epis.db` (DEBUG para cada sentencia, WARNING para las lentas).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+DB_PROFILE = os.getenv("DB_PROFILE", "1") == "1"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_SLOW_QUERY_EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "0") == "1"
+DB_SLOW_QUERY_LOG_SIZE = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "200"))
+
+logger = logging.getLogger("epis.db")
+
+# Scope ASGI de la petición actual (lo fija el middleware de main.py); la
+# plantilla de la ruta se lee al registrar, cuando el router ya la resolvió
+_scope: ContextVar[Optional[dict]] = ContextVar("db_scope", default=None)
+
+_lock = threading.Lock()
+_agregados: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_lentas: Deque[Dict[str, Any]] = deque(maxlen=DB_SLOW_QUERY_LOG_SIZE)
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+def set_scope(scope: Optional[dict]) -> Token:
+    return _scope.set(scope)
+
+
+def reset_scope(token: Token) -> None:
+    _scope.reset(token)
+
+
+def ruta_actual() -> str:
+    scope = _scope.get()
+    if not scope:
+        return "-"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+def _normalizar(sql: str) -> str:
+    return _RE_ESPACIOS.sub(" ", sql).strip()[:500]
+
+
+def registrar(
+    sql: str,
+    params: Tuple[Any, ...],
+    inicio: float,
+    filas: int,
+    conn=None,
+) -> None:
+    """Registra una sentencia ya ejecutada (`inicio` = time.perf_counter())."""
+    if not DB_PROFILE:
+        return
+    ms = (time.perf_counter() - inicio) * 1000
+    ruta = ruta_actual()
+    sql_n = _normalizar(sql)
+
+    with _lock:
+        agg = _agregados.get((ruta, sql_n))
+        if agg is None:
+            agg = _agregados[(ruta, sql_n)] = {
+                "ruta": ruta,
+                "sql": sql_n,
+                "llamadas": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "filas": 0,
+            }
+        agg["llamadas"] += 1
+        agg["total_ms"] += ms
+        agg["max_ms"] = max(agg["max_ms"], ms)
+        agg["filas"] += filas
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps(
+            {"evento": "consulta", "ruta": ruta, "ms": round(ms, 2), "filas": filas, "sql": sql_n}
+        ))
+
+    if ms < DB_SLOW_QUERY_MS:
+        return
+    entrada: Dict[str, Any] = {
+        "ts": time.time(),
+        "ruta": ruta,
+        "ms": round(ms, 2),
+        "filas": filas,
+        "sql": sql_n,
+    }
+    if DB_SLOW_QUERY_EXPLAIN and conn is not None and sql_n.upper().startswith("SELECT"):
+        entrada["explain"] = _explain(conn, sql, params)
+    with _lock:
+        _lentas.append(entrada)
+    logger.warning(json.dumps({"evento": "consulta_lenta", **entrada}, default=str))
+
+
+def _explain(conn, sql: str, params: Tuple[Any, ...]) -> Any:
+    try:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("EXPLAIN " + sql, params)
+            return cur.fetchall()
+        finally:
+            cur.close()
+    except Exception as e:
+        return f"EXPLAIN falló: {e}"
+
+
+def snapshot(top: int = 50) -> Dict[str, Any]:
+    with _lock:
+        agregados = sorted(_agregados.values(), key=lambda a: a["total_ms"], reverse=True)[:top]
+        consultas = [
+            {
+                **a,
+                "total_ms": round(a["total_ms"], 2),
+                "max_ms": round(a["max_ms"], 2),
+                "media_ms": round(a["total_ms"] / a["llamadas"], 2),
+            }
+            for a in agregados
+        ]
+        lentas: List[Dict[str, Any]] = list(_lentas)
+    return {
+        "habilitado": DB_PROFILE,
+        "umbral_ms": DB_SLOW_QUERY_MS,
+        "consultas": consultas,
+        "lentas": lentas,
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _agregados.clear()
+        _lentas.clear()
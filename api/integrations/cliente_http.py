@@ -0,0 +1,166 @@
+"""
+Cliente HTTP compartido por las integraciones (Graph, SharePoint, GitHub).
+
+- Una `requests.Session` por host con su propio pool de conexiones
+  keep-alive (`HTTP_POOL_MAXSIZE` por host): los chunks de una subida y
+  las llamadas seguidas a Graph reutilizan la conexión TLS.
+- Reintentos con backoff exponencial (y jitter) ante 429/503/504,
+  respetando `Retry-After`; los errores de conexión solo se reintentan en
+  métodos idempotentes.
+- Métricas por host (peticiones, reintentos, códigos, latencias p50/p95)
+  en `GET /admin/debug/http`.
+
+Es seguro entre hilos: las subidas corren en el threadpool de FastAPI.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+# Un Retry-After mayor que esto no se espera: se devuelve la respuesta
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "60"))
+
+_REINTENTABLES = {429, 503, 504}
+_IDEMPOTENTES = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+_MUESTRAS = 512
+
+_lock = threading.Lock()
+_sesiones: Dict[str, requests.Session] = {}
+_metricas: Dict[str, "_MetricasHost"] = {}
+
+
+class _MetricasHost:
+    def __init__(self):
+        self.peticiones = 0
+        self.reintentos = 0
+        self.errores_conexion = 0
+        self.por_status: Dict[int, int] = {}
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recientes: Deque[float] = deque(maxlen=_MUESTRAS)
+
+    def registrar(self, ms: float, status: Optional[int]) -> None:
+        self.peticiones += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recientes.append(ms)
+        if status is None:
+            self.errores_conexion += 1
+        else:
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+
+    def resumen(self) -> Dict[str, Any]:
+        orden = sorted(self.recientes)
+
+        def pct(p: float) -> float:
+            return round(orden[min(len(orden) - 1, int(len(orden) * p))], 1) if orden else 0.0
+
+        return {
+            "peticiones": self.peticiones,
+            "reintentos": self.reintentos,
+            "errores_conexion": self.errores_conexion,
+            "por_status": dict(sorted(self.por_status.items())),
+            "promedio_ms": round(self.total_ms / self.peticiones, 1) if self.peticiones else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+def _sesion(host: str) -> requests.Session:
+    with _lock:
+        sesion = _sesiones.get(host)
+        if sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            _sesiones[host] = sesion
+            _metricas[host] = _MetricasHost()
+        return sesion
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    valor = r.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _espera(intento: int) -> float:
+    tope = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** intento))
+    return tope / 2 + random.uniform(0, tope / 2)
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Como `requests.request`, con la sesión del host y los reintentos."""
+    method = method.upper()
+    host = urlsplit(url).netloc
+    sesion = _sesion(host)
+    metricas = _metricas[host]
+    intento = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            r = sesion.request(method, url, **kwargs)
+        except requests.ConnectionError:
+            with _lock:
+                metricas.registrar((time.perf_counter() - t0) * 1000, None)
+            if method not in _IDEMPOTENTES or intento >= HTTP_MAX_RETRIES:
+                raise
+            espera = _espera(intento)
+        else:
+            with _lock:
+                metricas.registrar((time.perf_counter() - t0) * 1000, r.status_code)
+            if r.status_code not in _REINTENTABLES or intento >= HTTP_MAX_RETRIES:
+                return r
+            retry_after = _retry_after(r)
+            if retry_after is not None and retry_after > HTTP_RETRY_AFTER_MAX:
+                return r
+            espera = retry_after if retry_after is not None else _espera(intento)
+            r.close()
+        with _lock:
+            metricas.reintentos += 1
+        intento += 1
+        time.sleep(espera)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs: Any) -> requests.Response:
+    return request("PUT", url, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {host: m.resumen() for host, m in _metricas.items()}
+
+
+def reset() -> None:
+    with _lock:
+        for host in _metricas:
+            _metricas[host] = _MetricasHost()
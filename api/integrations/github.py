@@ -1,9 +1,10 @@
 import os
 import re
 import base64
-import requests
 from dotenv import load_dotenv
 
+from . import cliente_http
+
 load_dotenv()
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
@@ -54,14 +55,14 @@ def create_repo_for_concurso(nombre_concurso: str, privado: bool = True, descrip
         "description": (descripcion or f"Repositorio del concurso {nombre_concurso}"),
         "auto_init": True,  # crea README inicial
     }
-    r = requests.post(create_url, json=body, headers=_gh_headers(), timeout=30)
+    r = cliente_http.post(create_url, json=body, headers=_gh_headers(), timeout=30)
     if r.status_code in (201, 202):
         return r.json().get("html_url") or r.json().get("url")
 
     # Si ya existe, devolver su URL
     if r.status_code == 422:  # Unprocessable Entity (posible nombre ya usado)
         check_url = f"https://api.github.com/repos/{owner}/{repo_name}"
-        rc = requests.get(check_url, headers=_gh_headers(), timeout=20)
+        rc = cliente_http.get(check_url, headers=_gh_headers(), timeout=20)
         if rc.status_code == 200:
             return rc.json().get("html_url") or rc.json().get("url")
 
@@ -75,7 +76,7 @@ def create_file(owner: str, repo: str, path: str, content: str, mensaje: str = "
         "message": mensaje,
         "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
     }
-    r = requests.put(url, json=data, headers=_gh_headers(), timeout=30)
+    r = cliente_http.put(url, json=data, headers=_gh_headers(), timeout=30)
     return r.status_code in (200, 201)
 
 
@@ -85,7 +86,7 @@ def _resolve_owner_and_type() -> tuple[str, str]:
     if GITHUB_OWNER:
         return GITHUB_OWNER, GITHUB_OWNER_TYPE or "user"
     # Intentar leer el usuario desde el token
-    r = requests.get("https://api.github.com/user", headers=_gh_headers(), timeout=20)
+    r = cliente_http.get("https://api.github.com/user", headers=_gh_headers(), timeout=20)
     if r.status_code == 200:
         login = r.json().get("login") or ""
         if login:
@@ -1,7 +1,17 @@
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple, TypeVar
+
 import requests
 from dotenv import load_dotenv
 
+from . import cliente_http
+
+T = TypeVar("T")
+
 load_dotenv()
 
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
@@ -13,133 +23,255 @@ REFRESH_TOKEN = os.getenv("ONEDRIVE_REFRESH_TOKEN", "")
 BASE_FOLDER = os.getenv("ONEDRIVE_BASE_FOLDER", "PROYECTOS")
 SHARE_TYPE = os.getenv("ONEDRIVE_SHARE_TYPE", "view")
 SHARE_SCOPE = os.getenv("ONEDRIVE_SHARE_SCOPE", "anonymous")
+# El access_token se renueva este margen antes de su expires_in
+TOKEN_MARGIN_SECONDS = int(os.getenv("ONEDRIVE_TOKEN_MARGIN_SECONDS", "300"))
+# Refresh token rotado por el endpoint de tokens (tiene prioridad sobre .env)
+TOKEN_STORE = os.getenv(
+    "ONEDRIVE_TOKEN_STORE", os.path.join(os.path.dirname(__file__), "..", ".onedrive_token.json")
+)
+FOLDER_CACHE_SIZE = int(os.getenv("ONEDRIVE_FOLDER_CACHE_SIZE", "2048"))
 
 
 class OneDriveError(Exception):
-    pass
+    def __init__(self, mensaje: str, status: Optional[int] = None):
+        super().__init__(mensaje)
+        # Código HTTP de Graph, si el error vino de una respuesta
+        self.status = status
 
 
 def _headers(token: str):
     return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
 
-def get_access_token() -> str:
-    """
-    Obtiene un access_token usando el refresh_token almacenado en .env.
-    Requiere que el app en Azure AD tenga permisos Delegados a Graph y
-    que el refresh token provenga de un usuario con acceso a OneDrive.
-    """
-    if not (TENANT_ID and CLIENT_ID and CLIENT_SECRET and REFRESH_TOKEN):
-        raise OneDriveError("Variables .env de OneDrive incompletas")
+# Caché del access_token compartida por los hilos del proceso. Un solo hilo
+# hace el intercambio con el endpoint de tokens; los demás esperan el lock y
+# reutilizan el resultado.
+_token_lock = threading.Lock()
+_access_token: Optional[str] = None
+_access_expira = 0.0  # time.monotonic()
+
+
+def _leer_refresh_guardado() -> Optional[str]:
+    try:
+        with open(TOKEN_STORE, encoding="utf-8") as f:
+            return json.load(f).get("refresh_token") or None
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_refresh(refresh_token: str) -> None:
+    # Escritura atómica: otro worker puede estar leyendo el archivo
+    tmp = f"{TOKEN_STORE}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"refresh_token": refresh_token, "guardado": int(time.time())}, f)
+        os.replace(tmp, TOKEN_STORE)
+    except OSError:
+        # Sin disco escribible se sigue con el token en memoria
+        pass
+
+
+def _pedir_token(refresh_token: str) -> requests.Response:
     token_url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
     data = {
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET,
         "grant_type": "refresh_token",
-        "refresh_token": REFRESH_TOKEN,
+        "refresh_token": refresh_token,
         "scope": "https://graph.microsoft.com/.default offline_access",
     }
-    r = requests.post(token_url, data=data, timeout=20)
-    if r.status_code != 200:
-        raise OneDriveError(f"Error obteniendo token: {r.status_code} {r.text}")
-    return r.json().get("access_token", "")
+    return cliente_http.post(token_url, data=data, timeout=20)
 
 
-def ensure_folder_chain(token: str, segments: list[str]) -> str:
+def get_access_token(forzar: bool = False) -> str:
     """
-    Asegura la existencia de la cadena de carpetas en OneDrive y retorna el id
-    de la última carpeta.
+    Obtiene un access_token usando el refresh_token almacenado en .env.
+    Requiere que el app en Azure AD tenga permisos Delegados a Graph y
+    que el refresh token provenga de un usuario con acceso a OneDrive.
+
+    El token se reutiliza hasta `TOKEN_MARGIN_SECONDS` antes de expirar;
+    `forzar=True` lo renueva (lo hace `con_token` tras un 401 de Graph).
+    Si el endpoint devuelve un refresh_token nuevo se guarda en
+    `TOKEN_STORE`, que se lee antes que `.env` (así lo ven también los
+    demás workers).
     """
-    parent_id = "root"
-    path_prefix = ""
-    for seg in segments:
-        path_prefix = f"{path_prefix}/{seg}" if path_prefix else seg
-        # Intentar obtener la carpeta por path
-        url = f"{GRAPH_BASE}/me/drive/root:/{path_prefix}"
-        r = requests.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=15)
+    global _access_token, _access_expira
+    token = _access_token
+    if token and not forzar and time.monotonic() < _access_expira:
+        return token
+    if not (TENANT_ID and CLIENT_ID and CLIENT_SECRET and REFRESH_TOKEN):
+        raise OneDriveError("Variables .env de OneDrive incompletas")
+
+    with _token_lock:
+        # Otro hilo pudo renovarlo mientras se esperaba el lock
+        if _access_token and time.monotonic() < _access_expira and (not forzar or _access_token != token):
+            return _access_token
+        guardado = _leer_refresh_guardado()
+        refresh_token = guardado or REFRESH_TOKEN
+        r = _pedir_token(refresh_token)
+        if r.status_code == 400 and guardado and guardado != REFRESH_TOKEN:
+            # El token guardado fue revocado pero quizá .env trae uno nuevo
+            refresh_token = REFRESH_TOKEN
+            r = _pedir_token(refresh_token)
+        if r.status_code != 200:
+            raise OneDriveError(f"Error obteniendo token: {r.status_code} {r.text}")
+        data = r.json()
+        nuevo_refresh = data.get("refresh_token")
+        if nuevo_refresh and nuevo_refresh != refresh_token:
+            _guardar_refresh(nuevo_refresh)
+        vigencia = int(data.get("expires_in", 3600))
+        _access_expira = time.monotonic() + max(0, vigencia - TOKEN_MARGIN_SECONDS)
+        _access_token = data.get("access_token", "")
+        return _access_token
+
+
+def con_token(operacion: Callable[[str], T]) -> T:
+    """
+    Ejecuta `operacion(token)`. Si Graph responde 401 (token revocado o
+    vencido antes de lo previsto) renueva el token una vez con
+    `forzar=True` y repite la operación, que debe ser idempotente.
+    """
+    token = get_access_token()
+    try:
+        return operacion(token)
+    except OneDriveError as e:
+        if e.status != 401:
+            raise
+    return operacion(get_access_token(forzar=True))
+
+
+class CarpetasCache:
+    """
+    Ruta -> id de driveItem de las carpetas ya vistas, con desalojo LRU.
+    La clave incluye la base del drive (OneDrive del usuario o drive de
+    SharePoint). Un id que Graph responde con 404 se invalida junto con
+    todas sus subcarpetas.
+    """
+
+    def __init__(self, max_entries: int = FOLDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._datos: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+    def get(self, drive: str, path: str) -> Optional[str]:
+        with self._lock:
+            item_id = self._datos.get((drive, path))
+            if item_id is not None:
+                self._datos.move_to_end((drive, path))
+            return item_id
+
+    def set(self, drive: str, path: str, item_id: str) -> None:
+        with self._lock:
+            self._datos[(drive, path)] = item_id
+            self._datos.move_to_end((drive, path))
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, drive: str, path: str) -> None:
+        with self._lock:
+            for k in [k for k in self._datos if k[0] == drive and (k[1] == path or k[1].startswith(path + "/"))]:
+                del self._datos[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+
+carpetas_cache = CarpetasCache()
+
+
+def asegurar_carpetas(token: str, drive: str, segments: list[str], etiqueta: str = "") -> str:
+    """
+    Asegura la cadena de carpetas `segments` bajo la raíz de `drive` (p.ej.
+    `{GRAPH_BASE}/me/drive`) y retorna el id de la última.
+
+    Con la ruta completa en caché no hay llamadas a Graph. Si no, se
+    consulta desde la ruta completa hacia arriba hasta dar con una carpeta
+    existente o con el ancestro más profundo en caché, y se crea solo la
+    cola que falta. En el caso habitual (solo falta la carpeta del
+    estudiante) son un GET y un POST.
+    """
+    prefijos = ["/".join(segments[: i + 1]) for i in range(len(segments))]
+    if not prefijos:
+        return "root"
+    item_id = carpetas_cache.get(drive, prefijos[-1])
+    if item_id is not None:
+        return item_id
+    try:
+        return _crear_cola(token, drive, prefijos, etiqueta)
+    except OneDriveError as e:
+        if e.status != 404:
+            raise
+        # Un ancestro cacheado ya no existe: se olvida todo y se parte de la raíz
+        carpetas_cache.invalidar(drive, prefijos[0])
+        return _crear_cola(token, drive, prefijos, etiqueta)
+
+
+def _crear_cola(token: str, drive: str, prefijos: list[str], etiqueta: str) -> str:
+    auth = {"Authorization": f"Bearer {token}"}
+    # Ancestro más profundo en caché (-1: la raíz del drive)
+    base, parent_id = -1, "root"
+    for i in range(len(prefijos) - 2, -1, -1):
+        cacheado = carpetas_cache.get(drive, prefijos[i])
+        if cacheado is not None:
+            base, parent_id = i, cacheado
+            break
+
+    # Carpeta existente más profunda por debajo de ese ancestro
+    for i in range(len(prefijos) - 1, base, -1):
+        r = cliente_http.get(f"{drive}/root:/{prefijos[i]}", headers=auth, timeout=15)
         if r.status_code == 200:
-            parent_id = r.json()["id"]
-            continue
-        if r.status_code not in (404,):
+            base, parent_id = i, r.json()["id"]
+            carpetas_cache.set(drive, prefijos[i], parent_id)
+            break
+        if r.status_code != 404:
             raise OneDriveError(
-                f"No se pudo consultar carpeta '{path_prefix}': {r.status_code} {r.text}"
+                f"No se pudo consultar carpeta{etiqueta} '{prefijos[i]}': {r.status_code} {r.text}", r.status_code
             )
-        # Crear carpeta bajo el padre actual
-        create_url = (
-            f"{GRAPH_BASE}/me/drive/items/{parent_id}/children"
-            if parent_id != "root"
-            else f"{GRAPH_BASE}/me/drive/root/children"
-        )
-        body = {"name": seg, "folder": {}, "@microsoft.graph.conflictBehavior": "rename"}
-        r2 = requests.post(create_url, json=body, headers=_headers(token), timeout=15)
-        if r2.status_code not in (200, 201):
+
+    for i in range(base + 1, len(prefijos)):
+        create_url = f"{drive}/items/{parent_id}/children" if parent_id != "root" else f"{drive}/root/children"
+        nombre = prefijos[i].rsplit("/", 1)[-1]
+        # fail (no rename): si otra petición la creó en paralelo se usa esa
+        body = {"name": nombre, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+        r = cliente_http.post(create_url, json=body, headers=_headers(token), timeout=15)
+        if r.status_code == 409:
+            r = cliente_http.get(f"{drive}/root:/{prefijos[i]}", headers=auth, timeout=15)
+        if r.status_code not in (200, 201):
             raise OneDriveError(
-                f"No se pudo crear carpeta '{path_prefix}': {r2.status_code} {r2.text}"
+                f"No se pudo crear carpeta{etiqueta} '{prefijos[i]}': {r.status_code} {r.text}", r.status_code
             )
-        parent_id = r2.json()["id"]
+        parent_id = r.json()["id"]
+        carpetas_cache.set(drive, prefijos[i], parent_id)
     return parent_id
 
 
-def upload_large_file(token: str, folder_path: str, file_name: str, file_obj) -> dict:
+def ensure_folder_chain(token: str, segments: list[str]) -> str:
     """
-    Sube un archivo grande en chunks usando un UploadSession.
-    Retorna el driveItem del archivo subido.
+    Asegura la existencia de la cadena de carpetas en OneDrive y retorna el id
+    de la última carpeta.
     """
-    session_url = f"{GRAPH_BASE}/me/drive/root:/{folder_path}/{file_name}:/createUploadSession"
-    body = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
-    r = requests.post(session_url, json=body, headers=_headers(token), timeout=20)
-    if r.status_code not in (200, 201):
-        raise OneDriveError(f"No se pudo crear upload session: {r.status_code} {r.text}")
-    upload_url = r.json()["uploadUrl"]
+    return asegurar_carpetas(token, f"{GRAPH_BASE}/me/drive", segments)
 
-    # Determinar tamaño total
-    try:
-        file_obj.seek(0, 2)
-        total_size = file_obj.tell()
-        file_obj.seek(0)
-    except Exception:
-        # Fallback: leer todo en memoria (no ideal, pero seguro para archivos pequeños)
-        data_all = file_obj.read()
-        total_size = len(data_all)
-        file_obj = BytesIO(data_all)  # type: ignore
-
-    chunk_size = 8 * 1024 * 1024  # 8MB
-    uploaded = 0
-    while uploaded < total_size:
-        chunk = file_obj.read(min(chunk_size, total_size - uploaded))
-        start = uploaded
-        end = uploaded + len(chunk) - 1
-        headers = {
-            "Content-Length": str(len(chunk)),
-            "Content-Range": f"bytes {start}-{end}/{total_size}",
-        }
-        resp = requests.put(upload_url, data=chunk, headers=headers, timeout=60)
-        if resp.status_code not in (200, 201, 202):
-            raise OneDriveError(
-                f"Error subiendo chunk {start}-{end}: {resp.status_code} {resp.text}"
-            )
-        uploaded = end + 1
 
-    # Recuperar el item subido
-    item_resp = requests.get(
-        f"{GRAPH_BASE}/me/drive/root:/{folder_path}/{file_name}",
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=15,
-    )
-    if item_resp.status_code != 200:
-        raise OneDriveError(
-            f"No se pudo recuperar archivo subido: {item_resp.status_code} {item_resp.text}"
-        )
-    return item_resp.json()
+def upload_large_file(token: str, folder_path: str, file_name: str, file_obj) -> dict:
+    """
+    Sube un archivo grande en chunks usando un UploadSession (ver
+    `integrations.subida`). Retorna el driveItem del archivo subido.
+    """
+    from .subida import subir_archivo  # subida importa OneDriveError de este módulo
+
+    return subir_archivo(token, f"{GRAPH_BASE}/me/drive/root:/{folder_path}/{file_name}", file_obj)
 
 
 def create_share_link(token: str, item_id: str) -> str:
     url = f"{GRAPH_BASE}/me/drive/items/{item_id}/createLink"
     body = {"type": SHARE_TYPE, "scope": SHARE_SCOPE}
-    r = requests.post(url, json=body, headers=_headers(token), timeout=15)
+    r = cliente_http.post(url, json=body, headers=_headers(token), timeout=15)
     if r.status_code not in (200, 201):
         raise OneDriveError(
-            f"No se pudo crear link compartido: {r.status_code} {r.text}"
+            f"No se pudo crear link compartido: {r.status_code} {r.text}", r.status_code
         )
     data = r.json()
     return data.get("link", {}).get("webUrl") or data.get("webUrl")
@@ -155,7 +287,14 @@ def upload_zip_and_share(
     """
     Sube el ZIP a la ruta organizada del concurso y retorna un enlace público.
     """
-    token = get_access_token()
+    return con_token(
+        lambda token: _upload_zip_and_share(token, concurso_id, categoria_id, estudiante_id, titulo, zip_file)
+    )
+
+
+def _upload_zip_and_share(
+    token: str, concurso_id: int, categoria_id: int, estudiante_id: int, titulo: str, zip_file
+) -> str:
     base = BASE_FOLDER.strip("/")
 
     # Estructura: BASE/concurso_<id>/categoria_<id>/estudiante_<id>
@@ -170,6 +309,14 @@ def upload_zip_and_share(
 
     safe_name = f"{titulo.strip().replace(' ', '_')}.zip"
     real_file_obj = zip_file.file if hasattr(zip_file, "file") else zip_file
-    item = upload_large_file(token, folder_path, safe_name, real_file_obj)
+    try:
+        item = upload_large_file(token, folder_path, safe_name, real_file_obj)
+    except OneDriveError as e:
+        if e.status != 404:
+            raise
+        # La carpeta en caché fue borrada en OneDrive: recrear la cadena
+        carpetas_cache.invalidar(f"{GRAPH_BASE}/me/drive", folder_path)
+        ensure_folder_chain(token, path_segments)
+        item = upload_large_file(token, folder_path, safe_name, real_file_obj)
     link = create_share_link(token, item["id"])
     return link
\ No newline at end of file
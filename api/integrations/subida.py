@@ -0,0 +1,165 @@
+"""
+Subida por upload session de Graph, compartida por OneDrive y SharePoint.
+
+El archivo se lee por chunks directamente del `UploadFile` (que FastAPI
+ya tiene en un SpooledTemporaryFile): en memoria hay como mucho un chunk.
+Si un chunk falla (error de red, 5xx después de los reintentos de
+`cliente_http`, 416 por un rango ya recibido) se consulta la sesión y se
+continúa desde su `nextExpectedRanges` en vez de abandonar la subida. Si
+se pierde la respuesta del último chunk Graph ya cerró la sesión (404): se
+confirma el driveItem y su tamaño con un GET al item.
+
+`ONEDRIVE_CHUNK_BYTES` fija el tamaño de chunk; Graph exige múltiplos de
+320 KiB, así que se redondea hacia abajo (mínimo 320 KiB, máximo 60 MiB).
+"""
+import os
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional
+
+import requests
+
+from . import cliente_http
+from .onedrive import OneDriveError
+
+UNIDAD_CHUNK = 320 * 1024
+_CHUNK_MAX = 192 * UNIDAD_CHUNK  # 60 MiB, límite de Graph por petición
+
+
+def tamano_chunk(bytes_pedidos: int) -> int:
+    return min(_CHUNK_MAX, max(UNIDAD_CHUNK, bytes_pedidos // UNIDAD_CHUNK * UNIDAD_CHUNK))
+
+
+CHUNK_BYTES = tamano_chunk(int(os.getenv("ONEDRIVE_CHUNK_BYTES", str(10 * 1024 * 1024))))
+# Reanudaciones seguidas sin avanzar antes de dar la subida por fallida
+REANUDACIONES_MAX = int(os.getenv("ONEDRIVE_UPLOAD_REANUDACIONES", "5"))
+
+
+def _siguiente_offset(rangos: Any) -> Optional[int]:
+    # nextExpectedRanges: ["26214400-", "30000000-30999999"]; se continúa por el primero
+    if not rangos:
+        return None
+    try:
+        return int(str(rangos[0]).split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+def _estado_sesion(upload_url: str, total: int, etiqueta: str) -> Optional[int]:
+    """Offset desde el que continuar; None si la sesión ya no existe (404)."""
+    r = cliente_http.get(upload_url, timeout=20)
+    if r.status_code == 404:
+        return None
+    if r.status_code != 200:
+        raise OneDriveError(f"No se pudo consultar la sesión de subida{etiqueta}: {r.status_code} {r.text}")
+    offset = _siguiente_offset(r.json().get("nextExpectedRanges"))
+    # Sin rangos pendientes: Graph ya tiene todos los bytes
+    return total if offset is None else offset
+
+
+def _confirmar_item(token: str, item_url: str, total: int, etiqueta: str) -> Dict[str, Any]:
+    # Graph guardó el último chunk pero la respuesta se perdió y cerró la
+    # sesión: el driveItem ya existe con el tamaño completo
+    r = cliente_http.get(item_url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
+    if r.status_code != 200:
+        raise OneDriveError(f"La sesión de subida{etiqueta} expiró", r.status_code)
+    item = r.json()
+    if item.get("size") != total:
+        raise OneDriveError(
+            f"La sesión de subida{etiqueta} terminó con {item.get('size')} bytes de {total}"
+        )
+    return item
+
+
+def _tamano(file_obj: BinaryIO) -> Optional[int]:
+    try:
+        file_obj.seek(0, 2)
+        total = file_obj.tell()
+        file_obj.seek(0)
+        return total
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def subir_archivo(
+    token: str, item_url: str, file_obj: BinaryIO, etiqueta: str = "", chunk_bytes: int = CHUNK_BYTES
+) -> Dict[str, Any]:
+    """
+    Sube `file_obj` al item `item_url` (p.ej. `.../root:/carpeta/archivo.zip`)
+    y retorna su driveItem.
+    """
+    chunk_bytes = tamano_chunk(chunk_bytes)
+    total = _tamano(file_obj)
+    if total is None:
+        # Sin seek (un stream): se copia a disco, nunca a memoria
+        with tempfile.TemporaryFile() as tmp:
+            shutil.copyfileobj(file_obj, tmp, chunk_bytes)
+            return subir_archivo(token, item_url, tmp, etiqueta, chunk_bytes)
+
+    if total == 0:
+        # Una upload session no admite archivos vacíos
+        r = cliente_http.put(f"{item_url}:/content", data=b"", headers={"Authorization": f"Bearer {token}"}, timeout=20)
+        if r.status_code not in (200, 201):
+            raise OneDriveError(f"No se pudo subir archivo vacío{etiqueta}: {r.status_code} {r.text}", r.status_code)
+        return r.json()
+
+    body = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+    auth = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    r = cliente_http.post(f"{item_url}:/createUploadSession", json=body, headers=auth, timeout=20)
+    if r.status_code not in (200, 201):
+        raise OneDriveError(
+            f"No se pudo crear upload session{etiqueta}: {r.status_code} {r.text}", r.status_code
+        )
+    upload_url = r.json()["uploadUrl"]
+
+    offset = 0
+    fallos = 0
+    final_enviado = False
+    while True:
+        if offset >= total:
+            # La sesión no espera más bytes pero no se vio la respuesta final
+            return _confirmar_item(token, item_url, total, etiqueta)
+        file_obj.seek(offset)
+        chunk = file_obj.read(min(chunk_bytes, total - offset))
+        end = offset + len(chunk) - 1
+        # uploadUrl ya viene autenticada: no se envía el Bearer
+        headers = {"Content-Length": str(len(chunk)), "Content-Range": f"bytes {offset}-{end}/{total}"}
+        final_enviado = final_enviado or end == total - 1
+        try:
+            resp = cliente_http.put(upload_url, data=chunk, headers=headers, timeout=120)
+        except requests.RequestException as e:
+            resp, error = None, str(e)
+        else:
+            error = f"{resp.status_code} {resp.text[:200]}"
+        del chunk
+
+        if resp is not None and resp.status_code in (200, 201):
+            return resp.json()
+        if resp is not None and resp.status_code == 202:
+            siguiente = _siguiente_offset(resp.json().get("nextExpectedRanges"))
+            offset, fallos = (siguiente if siguiente is not None else end + 1), 0
+            continue
+        if resp is not None and resp.status_code == 404 and final_enviado:
+            # Reintento de un PUT cuya respuesta se perdió: la sesión ya cerró
+            return _confirmar_item(token, item_url, total, etiqueta)
+        if resp is not None and resp.status_code < 500 and resp.status_code not in (408, 416, 429):
+            raise OneDriveError(f"Error subiendo chunk{etiqueta} {offset}-{end}: {error}", resp.status_code)
+
+        # Falla transitoria o rango ya recibido: continuar donde diga la sesión
+        fallos += 1
+        if fallos > REANUDACIONES_MAX:
+            raise OneDriveError(f"Error subiendo chunk{etiqueta} {offset}-{end} tras {REANUDACIONES_MAX} reintentos: {error}")
+        try:
+            reanudar = _estado_sesion(upload_url, total, etiqueta)
+        except requests.RequestException as e:
+            # Tampoco responde la consulta de estado: se reintenta el mismo
+            # chunk (cuenta en `fallos`) en vez de abortar la subida
+            error = f"{error}; estado de la sesión: {e}"
+            continue
+        if reanudar is None:
+            if not final_enviado:
+                raise OneDriveError(f"La sesión de subida{etiqueta} expiró")
+            return _confirmar_item(token, item_url, total, etiqueta)
+        if reanudar > offset:
+            fallos = 0
+        offset = reanudar
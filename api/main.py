@@ -1,14 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+import db
+import db_async
+import db_profile
+from compresion import CompresionMiddleware
+from db_pool import PoolTimeout
 
 # Routers
 from routers.auth_admin import router as admin_auth_router
 from routers.auth_estudiantes import router as estudiantes_auth_router
 from routers.concursos import router as concursos_router
 from routers.categorias import router as categorias_router
-from routers.proyectos import router as proyectos_router
+from routers.proyectos import router as proyectos_router, iniciar_subidas, detener_subidas
+from routers.debug import router as debug_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Retoma las subidas que quedaron en el spool (SUBIDAS_ASYNC=1)
+    await iniciar_subidas()
+    yield
+    await detener_subidas()
+    db_async.shutdown()
+
 
-app = FastAPI(title="EPIS Proyectos API", version="0.1.0")
+app = FastAPI(title="EPIS Proyectos API", version="0.1.0", lifespan=lifespan)
 
 # CORS (ajusta origins según despliegue)
 app.add_middleware(
@@ -19,13 +39,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli para respuestas grandes (listados, NDJSON, MessagePack)
+app.add_middleware(CompresionMiddleware)
+
+@app.middleware("http")
+async def cliente_db(request: Request, call_next):
+    # Identifica al cliente para read-your-writes con réplicas de lectura y
+    # la ruta para el perfilado de consultas
+    cliente = request.headers.get("x-client-id") or (request.client.host if request.client else None)
+    token = db.set_client(cliente)
+    token_scope = db_profile.set_scope(request.scope)
+    try:
+        return await call_next(request)
+    finally:
+        db_profile.reset_scope(token_scope)
+        db.reset_client(token)
+
+@app.exception_handler(PoolTimeout)
+async def pool_agotado(request: Request, exc: PoolTimeout):
+    # Back-pressure: el cliente reintenta en lugar de recibir un 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, reintenta en unos segundos"},
+        headers={"Retry-After": "2"},
+    )
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/health/db")
+async def health_db():
+    try:
+        await db_async.query("SELECT 1")
+        estado = "ok"
+    except Exception as e:
+        estado = f"error: {e}"
+    return {"status": estado, "pool": db.pool_stats(), "replicas": db.replicas_stats()}
+
 # Registrar routers
 app.include_router(admin_auth_router, prefix="/admin/auth", tags=["admin-auth"])
 app.include_router(estudiantes_auth_router, prefix="/estudiantes/auth", tags=["estudiantes-auth"])
 app.include_router(concursos_router, prefix="/concursos", tags=["concursos"])
 app.include_router(categorias_router, prefix="/categorias", tags=["categorias"])
-app.include_router(proyectos_router, prefix="/proyectos", tags=["proyectos"])
\ No newline at end of file
+app.include_router(proyectos_router, prefix="/proyectos", tags=["proyectos"])
+app.include_router(debug_router, prefix="/admin/debug", tags=["debug"])
\ No newline at end of file
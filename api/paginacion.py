@@ -0,0 +1,113 @@
+"""
+Paginación por keyset para los listados ordenados por (fecha DESC, id DESC).
+
+El cursor `after` es opaco para los clientes: codifica la fecha y el id de
+la última fila de la página anterior, y la siguiente página continúa con
+`(fecha, id) < (cursor)` usando los índices compuestos de DB_SETUP.md.
+Cada listado registra sus variantes como consultas con nombre de `db`.
+La búsqueda (`GET /proyectos/buscar`) usa el mismo esquema con
+(relevancia, id) en lugar de la fecha.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from db import register_query
+
+PAGE_MAX = 500
+
+
+def _codificar(valores: List[Any]) -> str:
+    raw = json.dumps(valores).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decodificar(cursor: str) -> List[Any]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    return json.loads(raw)
+
+
+def encode_cursor(fecha: datetime, row_id: int) -> str:
+    return _codificar([fecha.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        fecha, row_id = _decodificar(cursor)
+        return datetime.fromisoformat(fecha), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def encode_cursor_relevancia(relevancia: float, row_id: int) -> str:
+    # json conserva el float exacto, así la comparación con el cursor es estable
+    return _codificar([relevancia, row_id])
+
+
+def decode_cursor_relevancia(cursor: str) -> Tuple[float, int]:
+    try:
+        relevancia, row_id = _decodificar(cursor)
+        return float(relevancia), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def registrar_keyset(key: str, sql: str, fecha_col: str, id_col: str, conector: str = "AND") -> str:
+    """
+    Registra en `db` las variantes de un listado con marcador `{keyset}`:
+    `key` (completo), `key:pagina` (primera página) y `key:siguiente`
+    (páginas con cursor). El LIMIT lleva una fila extra para saber si hay
+    página siguiente.
+    """
+    register_query(key, sql.format(keyset=""))
+    register_query(f"{key}:pagina", sql.format(keyset="") + " LIMIT %s")
+    register_query(
+        f"{key}:siguiente",
+        sql.format(keyset=f"{conector} ({fecha_col}, {id_col}) < (%s, %s)") + " LIMIT %s",
+    )
+    return key
+
+
+def keyset(
+    key: str, params: Tuple[Any, ...], limit: int, after: Optional[str]
+) -> Tuple[str, Tuple[Any, ...]]:
+    """Elige la variante registrada y sus parámetros para la página pedida."""
+    if after:
+        fecha, last_id = decode_cursor(after)
+        return f"{key}:siguiente", (*params, fecha, last_id, limit + 1)
+    return f"{key}:pagina", (*params, limit + 1)
+
+
+def keyset_sql(
+    sql: str,
+    fecha_col: str,
+    id_col: str,
+    params: Tuple[Any, ...],
+    limit: Optional[int],
+    after: Optional[str],
+    conector: str = "AND",
+) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Como `keyset` pero para SQL armado en tiempo de ejecución (no registrado),
+    p.ej. las proyecciones de `?fields=`. Sin `limit` devuelve el listado
+    completo.
+    """
+    if limit is None:
+        return sql.format(keyset=""), params
+    if after:
+        fecha, last_id = decode_cursor(after)
+        filtro = f"{conector} ({fecha_col}, {id_col}) < (%s, %s)"
+        return sql.format(keyset=filtro) + " LIMIT %s", (*params, fecha, last_id, limit + 1)
+    return sql.format(keyset="") + " LIMIT %s", (*params, limit + 1)
+
+
+def pagina(rows: List[Dict[str, Any]], limit: int, fecha_key: str) -> Dict[str, Any]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[fecha_key], last["id"])
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,127 @@
+"""
+Serialización rápida de filas de MySQL (JSON o MessagePack).
+
+Con `response_model=List[...]` FastAPI valida cada dict con Pydantic y lo
+vuelve a serializar; para filas que vienen de nuestras propias consultas
+eso no aporta nada y es lo más caro de un listado grande (sobre todo los
+datetime). `respuesta_filas()` arma la respuesta directamente con orjson,
+proyectando cada fila a los campos del modelo (mismo orden y `null` para
+los ausentes), así el JSON es el mismo que generaría Pydantic.
+
+Los routers conservan `response_model`, que sigue generando el esquema
+OpenAPI desde `schemas.py`; FastAPI no valida cuando el endpoint devuelve
+un `Response`. `FAST_JSON=0` vuelve a validar cada fila con el modelo
+(útil para depurar o comparar).
+
+Con `Accept: application/msgpack` (y el paquete `msgpack` instalado) el
+mismo contenido se envía en MessagePack; las fechas van como texto ISO,
+igual que en JSON.
+"""
+import os
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from compresion import calidades
+
+try:
+    import msgpack
+except ImportError:  # opcional: sin msgpack se responde siempre JSON
+    msgpack = None
+
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+MSGPACK = "application/msgpack"
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """MessagePack si el cliente lo acepta con `q > 0` y no prefiere JSON."""
+    if msgpack is None or not accept:
+        return False
+    q = calidades(accept)
+    q_msgpack = max(q.get(MSGPACK, 0.0), q.get("application/x-msgpack", 0.0))
+    return q_msgpack > 0 and q_msgpack >= q.get("application/json", 0.0)
+
+
+def _default(valor: Any) -> Any:
+    # DECIMAL (puntuacion) llega como Decimal; los modelos lo exponen como float
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def dumps(contenido: Any) -> bytes:
+    return orjson.dumps(contenido, default=_default)
+
+
+def _default_msgpack(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+class FilasJSON(Response):
+    """Respuesta JSON que serializa con orjson sin validar."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class FilasMsgPack(Response):
+    media_type = MSGPACK
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default_msgpack, datetime=False)
+
+
+@lru_cache(maxsize=None)
+def _campos(model: Type[BaseModel]) -> Tuple[str, ...]:
+    return tuple(model.model_fields)
+
+
+@lru_cache(maxsize=None)
+def _adaptador(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def proyectar(rows: Iterable[Dict[str, Any]], model: Optional[Type[BaseModel]]) -> List[Dict[str, Any]]:
+    """
+    Filas con exactamente los campos de `model`, en su orden. Con
+    `model=None` (proyecciones de `?fields=`) las filas se dejan tal cual.
+    """
+    if model is None:
+        return rows if isinstance(rows, list) else list(rows)
+    if not FAST_JSON:
+        return _adaptador(model).dump_python(_adaptador(model).validate_python(rows), mode="json")
+    campos = _campos(model)
+    return [{k: row.get(k) for k in campos} for row in rows]
+
+
+def respuesta(contenido: Any, accept: Optional[str] = None, **kwargs: Any) -> Response:
+    """JSON o MessagePack según `Accept`; el contenido ya debe estar proyectado."""
+    clase = FilasMsgPack if wants_msgpack(accept) else FilasJSON
+    headers = dict(kwargs.pop("headers", None) or {})
+    headers.setdefault("Vary", "Accept")
+    return clase(contenido, headers=headers, **kwargs)
+
+
+def respuesta_filas(
+    rows: List[Dict[str, Any]], model: Optional[Type[BaseModel]], accept: Optional[str] = None, **kwargs: Any
+) -> Response:
+    return respuesta(proyectar(rows, model), accept, **kwargs)
+
+
+def respuesta_pagina(
+    data: Dict[str, Any], model: Optional[Type[BaseModel]], accept: Optional[str] = None, **kwargs: Any
+) -> Response:
+    """Igual que `respuesta_filas` para el formato `{"items": [...], "next_cursor": ...}`."""
+    contenido = {"items": proyectar(data["items"], model), "next_cursor": data["next_cursor"]}
+    return respuesta(contenido, accept, **kwargs)
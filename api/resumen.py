@@ -0,0 +1,64 @@
+"""
+Resumen de proyectos por (concurso, categoría, estado) en la tabla
+`proyectos_resumen`, que responde `GET /concursos/{id}/stats` sin recorrer
+los proyectos del concurso.
+
+La API lo mantiene en la misma transacción que cada alta y cada cambio de
+estado/puntuación (`aplicar(tx, altas=..., bajas=...)`), así que nunca
+queda a medias. Si la tabla se desincroniza (p.ej. por SQL manual),
+`reconstruir()` la recalcula desde `proyectos`.
+"""
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import db
+
+# (concurso_id, categoria_id, estado, puntuacion)
+FilaResumen = Tuple[int, int, str, Optional[Any]]
+
+_SQL_DELTA_FILA = "(%s, %s, %s, %s, %s, %s)"
+_SQL_DELTA = """
+    INSERT INTO proyectos_resumen(concurso_id, categoria_id, estado, total, con_puntuacion, suma_puntuacion)
+    VALUES {filas}
+    ON DUPLICATE KEY UPDATE
+        total = total + VALUES(total),
+        con_puntuacion = con_puntuacion + VALUES(con_puntuacion),
+        suma_puntuacion = suma_puntuacion + VALUES(suma_puntuacion)
+    """
+
+SQL_RECONSTRUIR = """
+    INSERT INTO proyectos_resumen(concurso_id, categoria_id, estado, total, con_puntuacion, suma_puntuacion)
+    SELECT concurso_id, categoria_id, estado, COUNT(*), COUNT(puntuacion), COALESCE(SUM(puntuacion), 0)
+    FROM proyectos
+    {filtro}
+    GROUP BY concurso_id, categoria_id, estado
+    """
+
+
+def aplicar(tx: "db.Transaccion", altas: Iterable[FilaResumen] = (), bajas: Iterable[FilaResumen] = ()) -> None:
+    """Suma `altas` y resta `bajas` del resumen con un solo INSERT ... ON DUPLICATE KEY UPDATE."""
+    deltas: Dict[Tuple[int, int, str], List[Any]] = {}
+    for signo, filas in ((1, altas), (-1, bajas)):
+        for concurso_id, categoria_id, estado, puntuacion in filas:
+            d = deltas.setdefault((concurso_id, categoria_id, estado), [0, 0, Decimal(0)])
+            d[0] += signo
+            if puntuacion is not None:
+                d[1] += signo
+                d[2] += signo * Decimal(str(puntuacion))
+    # Un cambio que no altera ningún contador (p.ej. solo comentarios) no
+    # escribe; el orden fijo de claves evita deadlocks entre importaciones
+    cambios = [(k, d) for k, d in sorted(deltas.items()) if d[0] or d[1] or d[2]]
+    if not cambios:
+        return
+    tx.execute(
+        _SQL_DELTA.format(filas=", ".join([_SQL_DELTA_FILA] * len(cambios))),
+        tuple(v for k, d in cambios for v in (*k, *d)),
+    )
+
+
+def reconstruir(concurso_id: Optional[int] = None) -> int:
+    """Recalcula el resumen (de un concurso o de todos) desde `proyectos`."""
+    filtro, params = ("WHERE concurso_id=%s", (concurso_id,)) if concurso_id is not None else ("", ())
+    with db.transaction() as tx:
+        tx.execute(f"DELETE FROM proyectos_resumen {filtro}", params)
+        return tx.execute(SQL_RECONSTRUIR.format(filtro=filtro), params)
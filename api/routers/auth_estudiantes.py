@@ -1,65 +1,108 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict
 
-from db import query, insert
-from schemas import EstudianteLoginRequest, EstudianteRegisterRequest, EstudianteResponse
+import sesion
+from cache import CACHE_IDENTIDAD_MAX_ENTRIES, CACHE_IDENTIDAD_TTL_SECONDS, TTLCache
+from db import register_query, transaction
+from db_async import query_named, run
+from schemas import (
+    EstudianteLoginRequest,
+    EstudianteRegisterRequest,
+    EstudianteResponse,
+    EstudianteSesionResponse,
+    FirebaseLoginRequest,
+)
 
 router = APIRouter()
 
-@router.post("/login", response_model=EstudianteResponse)
-def login_estudiante(payload: EstudianteLoginRequest):
-    correo = payload.correo.strip().lower()
-    contrasena = payload.contrasena.strip()
-    rows = query(
-        """
-        SELECT id, nombres, apellidos, correo, numero_telefono
+# Fila de by_email por correo normalizado; None = no existe (404 cacheado).
+# register invalida el correo, así un 404 cacheado no oculta la cuenta nueva.
+identidad_cache = TTLCache(
+    "estudiantes_identidad", max_entries=CACHE_IDENTIDAD_MAX_ENTRIES, ttl=CACHE_IDENTIDAD_TTL_SECONDS
+)
+
+_LOGIN = register_query(
+    "estudiantes.login",
+    """
+        SELECT id, nombres, apellidos, correo, numero_telefono, ciclo
         FROM estudiantes
         WHERE correo=%s AND contrasena_hash=SHA2(%s, 256)
         LIMIT 1
         """,
-        (correo, contrasena),
-    )
-    if not rows:
-        raise HTTPException(status_code=401, detail="Credenciales incorrectas")
-    return rows[0]
+)
 
-# Nuevo: obtener estudiante por correo (para login vía Firebase)
-@router.get("/by_email/{correo}", response_model=EstudianteResponse)
-def obtener_estudiante_por_correo(correo: str):
-    correo_n = correo.strip().lower()
-    rows = query(
-        """
-        SELECT id, nombres, apellidos, correo, numero_telefono
+_BY_EMAIL = register_query(
+    "estudiantes.by_email",
+    """
+        SELECT id, nombres, apellidos, correo, numero_telefono, ciclo
         FROM estudiantes
         WHERE correo=%s
         LIMIT 1
         """,
-        (correo_n,),
-    )
+)
+
+def _con_token(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Copia: la fila puede venir de identidad_cache
+    token, expira = sesion.emitir(row["id"], "estudiante", row["correo"])
+    return dict(row, token=token, token_expira=expira)
+
+@router.post("/login", response_model=EstudianteSesionResponse)
+async def login_estudiante(payload: EstudianteLoginRequest):
+    correo = payload.correo.strip().lower()
+    contrasena = payload.contrasena.strip()
+    rows = await query_named(_LOGIN, (correo, contrasena))
     if not rows:
+        raise HTTPException(status_code=401, detail="Credenciales incorrectas")
+    return _con_token(rows[0])
+
+async def _identidad(correo_n: str) -> Dict[str, Any]:
+    async def cargar():
+        rows = await query_named(_BY_EMAIL, (correo_n,))
+        return rows[0] if rows else None
+
+    row = await identidad_cache.get_or_load(("correo", correo_n), None, cargar)
+    if row is None:
         raise HTTPException(status_code=404, detail="Estudiante no encontrado")
-    return rows[0]
+    return row
+
+# Nuevo: obtener estudiante por correo (para login vía Firebase).
+# Sin credenciales: devuelve el perfil pero no emite token de sesión.
+@router.get("/by_email/{correo}", response_model=EstudianteResponse)
+async def obtener_estudiante_por_correo(correo: str):
+    return await _identidad(correo.strip().lower())
+
+# Sesión a partir del ID token de Firebase verificado (ver sesion.py)
+@router.post("/firebase", response_model=EstudianteSesionResponse)
+async def login_estudiante_firebase(payload: FirebaseLoginRequest):
+    correo_n = await run_in_threadpool(sesion.correo_firebase, payload.id_token)
+    return _con_token(await _identidad(correo_n))
+
+def _registrar(payload: EstudianteRegisterRequest, correo: str) -> int:
+    # Verificación e inserción con una sola conexión y un solo commit
+    with transaction() as tx:
+        existing = tx.query("SELECT id FROM estudiantes WHERE correo=%s LIMIT 1", (correo,))
+        if existing:
+            raise HTTPException(status_code=409, detail="El correo ya existe")
+        return tx.insert(
+            """
+            INSERT INTO estudiantes(nombres, apellidos, codigo_universitario, correo, numero_telefono, ciclo, contrasena_hash, fecha_creacion)
+            VALUES(%s, %s, %s, %s, %s, %s, SHA2(%s,256), NOW())
+            """,
+            (
+                payload.nombres.strip(),
+                payload.apellidos.strip(),
+                payload.codigo_universitario.strip(),
+                correo,
+                payload.numero_telefono.strip(),
+                payload.ciclo,
+                payload.contrasena.strip(),
+            ),
+        )
 
 @router.post("/register", response_model=Dict[str, int])
-def register_estudiante(payload: EstudianteRegisterRequest):
+async def register_estudiante(payload: EstudianteRegisterRequest):
     correo = payload.correo.strip().lower()
-    existing = query("SELECT id FROM estudiantes WHERE correo=%s LIMIT 1", (correo,))
-    if existing:
-        raise HTTPException(status_code=409, detail="El correo ya existe")
-
-    estudiante_id = insert(
-        """
-        INSERT INTO estudiantes(nombres, apellidos, codigo_universitario, correo, numero_telefono, ciclo, contrasena_hash, fecha_creacion)
-        VALUES(%s, %s, %s, %s, %s, %s, SHA2(%s,256), NOW())
-        """,
-        (
-            payload.nombres.strip(),
-            payload.apellidos.strip(),
-            payload.codigo_universitario.strip(),
-            correo,
-            payload.numero_telefono.strip(),
-            payload.ciclo,
-            payload.contrasena.strip(),
-        ),
-    )
+    estudiante_id = await run(_registrar, payload, correo)
+    identidad_cache.invalidar(("correo", correo))
     return {"id": estudiante_id}
\ No newline at end of file
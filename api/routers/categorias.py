@@ -1,27 +1,59 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Header, Request
+from typing import Any, List, Dict, Optional, Tuple
 
-from db import query, insert, execute
+import condicional
+from cache import TTLCache
+from db import register_query, transaction
+from db_async import query_named, insert, execute, run
+from respuestas import respuesta_filas
 from schemas import CategoriaCreateRequest, CategoriaResponse
 
 router = APIRouter()
 
-@router.get("/por_concurso/{concurso_id}", response_model=List[CategoriaResponse])
-def listar_categorias_por_concurso(concurso_id: int):
-    rows = query(
-        """
+# Un grupo por concurso: ("categorias", concurso_id)
+categorias_cache = TTLCache("categorias")
+
+_POR_CONCURSO = register_query(
+    "categorias.por_concurso",
+    """
         SELECT id, nombre, concurso_id, rango_ciclos
         FROM categorias
         WHERE concurso_id=%s
         ORDER BY id ASC
         """,
-        (concurso_id,),
+)
+
+# Huella para GET condicionales: COUNT y MAX(id) cubren altas y bajas, y
+# MAX(fecha_modificacion) las ediciones hechas fuera de la API
+_VERSION = register_query(
+    "categorias.version_concurso",
+    """
+        SELECT COUNT(*) AS n, MAX(id) AS max_id, MAX(fecha_modificacion) AS modificado
+        FROM categorias
+        WHERE concurso_id=%s
+        """,
+)
+
+@router.get("/por_concurso/{concurso_id}", response_model=List[CategoriaResponse])
+async def listar_categorias_por_concurso(
+    concurso_id: int, request: Request, accept: Optional[str] = Header(None)
+):
+    grupo = ("categorias", concurso_id)
+    # La huella se cachea en el mismo grupo, así se invalida junto con el listado
+    huella = await categorias_cache.get_or_load(
+        grupo, "version", lambda: query_named(_VERSION, (concurso_id,))
     )
-    return rows
+    no_modificado, cabeceras = condicional.verificar(request, huella[0])
+    if no_modificado is not None:
+        return no_modificado
+    rows = await categorias_cache.get_or_load(
+        grupo, None, lambda: query_named(_POR_CONCURSO, (concurso_id,))
+    )
+    return respuesta_filas(rows, CategoriaResponse, accept, headers=cabeceras)
 
 @router.post("/", response_model=Dict[str, int])
-def crear_categoria(payload: CategoriaCreateRequest):
-    categoria_id = insert(
+async def crear_categoria(payload: CategoriaCreateRequest):
+    categoria_id = await insert(
         """
         INSERT INTO categorias(nombre, concurso_id, rango_ciclos)
         VALUES(%s, %s, %s)
@@ -32,9 +64,31 @@ def crear_categoria(payload: CategoriaCreateRequest):
             (payload.rango_ciclos or None),
         ),
     )
+    categorias_cache.invalidar(("categorias", payload.concurso_id))
     return {"id": categoria_id}
 
+_SQL_NUEVA = """
+    INSERT INTO categorias(nombre, concurso_id, rango_ciclos)
+    VALUES(%s, %s, %s)
+    """
+
+
+def _crear_bulk(filas: List[Tuple[Any, ...]]) -> List[int]:
+    # Lotes de DB_BULK_BATCH filas (sentencias acotadas) en una sola
+    # transacción: se crean todas las categorías o ninguna
+    with transaction() as tx:
+        return tx.insert_many(_SQL_NUEVA, filas)
+
+@router.post("/bulk", response_model=Dict[str, List[int]])
+async def crear_categorias_bulk(payload: List[CategoriaCreateRequest]):
+    if not payload:
+        raise HTTPException(status_code=400, detail="Nada que insertar")
+    ids = await run(_crear_bulk, [(c.nombre.strip(), c.concurso_id, (c.rango_ciclos or None)) for c in payload])
+    categorias_cache.invalidar(*{("categorias", c.concurso_id) for c in payload})
+    return {"ids": ids}
+
 @router.delete("/por_concurso/{concurso_id}", response_model=Dict[str, int])
-def eliminar_categorias_por_concurso(concurso_id: int):
-    affected = execute("DELETE FROM categorias WHERE concurso_id=%s", (concurso_id,))
+async def eliminar_categorias_por_concurso(concurso_id: int):
+    affected = await execute("DELETE FROM categorias WHERE concurso_id=%s", (concurso_id,))
+    categorias_cache.invalidar(("categorias", concurso_id))
     return {"deleted": affected}
\ No newline at end of file
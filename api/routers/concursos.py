@@ -1,49 +1,170 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict
 from integrations.github import create_repo_for_concurso, GithubError
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 
-from db import query, insert, execute
+from cache import TTLCache
+from db import named_sql, register_query, transaction
+from db_async import query, query_named, query_iter, insert, run
+from routers.categorias import categorias_cache
+from sesion import Sesion, requerir_rol
+from streaming import wants_ndjson, ndjson_response
+from respuestas import respuesta, respuesta_filas, respuesta_pagina
+from paginacion import PAGE_MAX, registrar_keyset, keyset, pagina
 from schemas import (
     ConcursoCreateRequest,
     ConcursoUpdateRequest,
     ConcursoDbResponse,
+    EstadisticasConcurso,
+    Pagina,
 )
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ConcursoDbResponse])
-def listar_concursos():
-    rows = query(
-        """
+# Grupos: ("concursos",) para el listado general y ("admin", admin_id) por
+# administrador; la clave es (limit, after) o None para la lista completa
+concursos_cache = TTLCache("concursos")
+
+
+def _invalidar(admin_id: int) -> None:
+    concursos_cache.invalidar(("concursos",), ("admin", admin_id))
+
+
+_LISTAR = registrar_keyset(
+    "concursos.listar",
+    """
         SELECT id, nombre, administrador_id,
                fecha_limite_inscripcion, fecha_revision,
                fecha_confirmacion_aceptados, fecha_creacion
         FROM concursos
+        {keyset}
         ORDER BY fecha_creacion DESC, id DESC
         """,
-        (),
-    )
-    return rows
+    "fecha_creacion",
+    "id",
+    conector="WHERE",
+)
 
-@router.get("/admin/{admin_id}", response_model=List[ConcursoDbResponse])
-def listar_concursos_por_admin(admin_id: int):
-    rows = query(
-        """
+_POR_ADMIN = registrar_keyset(
+    "concursos.por_admin",
+    """
         SELECT id, nombre, administrador_id,
                fecha_limite_inscripcion, fecha_revision,
                fecha_confirmacion_aceptados, fecha_creacion
         FROM concursos
-        WHERE administrador_id=%s
+        WHERE administrador_id=%s {keyset}
         ORDER BY fecha_creacion DESC, id DESC
         """,
-        (admin_id,),
+    "fecha_creacion",
+    "id",
+)
+
+@router.get("/", response_model=Union[List[ConcursoDbResponse], Pagina[ConcursoDbResponse]])
+async def listar_concursos(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    if limit is not None:
+        key, params = keyset(_LISTAR, (), limit, after)
+
+        async def cargar_pagina():
+            return pagina(await query_named(key, params), limit, "fecha_creacion")
+
+        data = await concursos_cache.get_or_load(("concursos",), (limit, after), cargar_pagina)
+        return respuesta_pagina(data, ConcursoDbResponse, accept)
+    if wants_ndjson(accept):
+        return ndjson_response(query_iter(named_sql(_LISTAR)), ConcursoDbResponse)
+    rows = await concursos_cache.get_or_load(("concursos",), None, lambda: query_named(_LISTAR))
+    return respuesta_filas(rows, ConcursoDbResponse, accept)
+
+@router.get("/admin/me", response_model=Union[List[ConcursoDbResponse], Pagina[ConcursoDbResponse]])
+async def listar_mis_concursos(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    sesion: Sesion = Depends(requerir_rol("admin")),
+):
+    """Como `/admin/{admin_id}` con el id del token de sesión."""
+    return await listar_concursos_por_admin(sesion.id, limit, after, accept)
+
+@router.get("/admin/{admin_id}", response_model=Union[List[ConcursoDbResponse], Pagina[ConcursoDbResponse]])
+async def listar_concursos_por_admin(
+    admin_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    if limit is not None:
+        key, params = keyset(_POR_ADMIN, (admin_id,), limit, after)
+
+        async def cargar_pagina():
+            return pagina(await query_named(key, params), limit, "fecha_creacion")
+
+        data = await concursos_cache.get_or_load(("admin", admin_id), (limit, after), cargar_pagina)
+        return respuesta_pagina(data, ConcursoDbResponse, accept)
+    rows = await concursos_cache.get_or_load(
+        ("admin", admin_id), None, lambda: query_named(_POR_ADMIN, (admin_id,))
     )
-    return rows
+    return respuesta_filas(rows, ConcursoDbResponse, accept)
+
+# Todas las categorías del concurso (también las vacías) con sus filas de
+# proyectos_resumen: el costo depende de categorías × estados, no de envíos
+_STATS = register_query(
+    "concursos.stats",
+    """
+        SELECT c.id AS categoria_id, c.nombre AS categoria_nombre,
+               r.estado, r.total, r.con_puntuacion, r.suma_puntuacion
+        FROM categorias c
+        LEFT JOIN proyectos_resumen r ON r.categoria_id = c.id AND r.total > 0
+        WHERE c.concurso_id=%s
+        ORDER BY c.id ASC
+        """,
+)
+
+def _promedio(suma, n: int) -> Optional[float]:
+    return round(float(suma) / n, 2) if n else None
+
+@router.get("/{concurso_id}/stats", response_model=EstadisticasConcurso)
+async def estadisticas_concurso(concurso_id: int, accept: Optional[str] = Header(None)):
+    """Proyectos por estado y puntuación promedio, por categoría y del concurso."""
+    categorias: Dict[int, dict] = {}
+    por_estado: Dict[str, int] = {}
+    con_puntuacion, suma = 0, 0
+    for row in await query_named(_STATS, (concurso_id,)):
+        cat = categorias.setdefault(row["categoria_id"], {
+            "categoria_id": row["categoria_id"],
+            "categoria_nombre": row["categoria_nombre"],
+            "total": 0,
+            "por_estado": {},
+            "con_puntuacion": 0,
+            "suma": 0,
+        })
+        if row["estado"] is None:
+            continue
+        cat["total"] += row["total"]
+        cat["por_estado"][row["estado"]] = row["total"]
+        cat["con_puntuacion"] += row["con_puntuacion"]
+        cat["suma"] += row["suma_puntuacion"]
+        por_estado[row["estado"]] = por_estado.get(row["estado"], 0) + row["total"]
+        con_puntuacion += row["con_puntuacion"]
+        suma += row["suma_puntuacion"]
+
+    return respuesta({
+        "concurso_id": concurso_id,
+        "total": sum(por_estado.values()),
+        "por_estado": por_estado,
+        "promedio_puntuacion": _promedio(suma, con_puntuacion),
+        "categorias": [
+            dict(c, promedio_puntuacion=_promedio(c.pop("suma"), c.pop("con_puntuacion")))
+            for c in categorias.values()
+        ],
+    }, accept)
 
 @router.post("/", response_model=Dict[str, int])
-def crear_concurso(payload: ConcursoCreateRequest):
-    concurso_id = insert(
+async def crear_concurso(payload: ConcursoCreateRequest):
+    concurso_id = await insert(
         """
         INSERT INTO concursos(
             nombre, administrador_id,
@@ -60,25 +181,34 @@ def crear_concurso(payload: ConcursoCreateRequest):
             payload.fecha_confirmacion_aceptados,
         ),
     )
+    _invalidar(payload.administrador_id)
     return {"id": concurso_id}
 
 
 @router.post("/{concurso_id}/github_repo", response_model=Dict[str, str])
-def crear_repo_github(concurso_id: int):
-    rows = query("SELECT nombre FROM concursos WHERE id=%s", (concurso_id,))
+async def crear_repo_github(concurso_id: int):
+    rows = await query("SELECT nombre FROM concursos WHERE id=%s", (concurso_id,))
     if not rows:
         raise HTTPException(status_code=404, detail="Concurso no encontrado")
     nombre = rows[0]["nombre"]
     try:
-        url = create_repo_for_concurso(nombre, privado=True)
+        url = await run_in_threadpool(create_repo_for_concurso, nombre, privado=True)
     except GithubError as e:
         raise HTTPException(status_code=500, detail=f"Error GitHub: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error inesperado: {e}")
     return {"repo_url": url}
 
+def _escribir_concurso(concurso_id: int, sql: str, params: Tuple) -> Tuple[Optional[int], int]:
+    # Lee el administrador en la misma transacción para invalidar solo su listado
+    with transaction() as tx:
+        rows = tx.query("SELECT administrador_id FROM concursos WHERE id=%s FOR UPDATE", (concurso_id,))
+        if not rows:
+            return None, 0
+        return rows[0]["administrador_id"], tx.execute(sql, params)
+
 @router.patch("/{concurso_id}", response_model=Dict[str, int])
-def actualizar_concurso(concurso_id: int, payload: ConcursoUpdateRequest):
+async def actualizar_concurso(concurso_id: int, payload: ConcursoUpdateRequest):
     campos = []
     valores = []
     if payload.nombre is not None:
@@ -99,14 +229,22 @@ def actualizar_concurso(concurso_id: int, payload: ConcursoUpdateRequest):
 
     valores.append(concurso_id)
     sql = f"UPDATE concursos SET {', '.join(campos)} WHERE id=%s"
-    affected = execute(sql, tuple(valores))
+    admin_id, affected = await run(_escribir_concurso, concurso_id, sql, tuple(valores))
+    if admin_id is not None:
+        _invalidar(admin_id)
     if affected == 0:
         raise HTTPException(status_code=404, detail="Concurso no encontrado")
     return {"updated": affected}
 
 @router.delete("/{concurso_id}", response_model=Dict[str, int])
-def eliminar_concurso(concurso_id: int):
-    affected = execute("DELETE FROM concursos WHERE id=%s", (concurso_id,))
+async def eliminar_concurso(concurso_id: int):
+    admin_id, affected = await run(
+        _escribir_concurso, concurso_id, "DELETE FROM concursos WHERE id=%s", (concurso_id,)
+    )
+    if admin_id is not None:
+        _invalidar(admin_id)
+        # ON DELETE CASCADE también borra sus categorías
+        categorias_cache.invalidar(("categorias", concurso_id))
     if affected == 0:
         raise HTTPException(status_code=404, detail="Concurso no encontrado")
     return {"deleted": affected}
\ No newline at end of file
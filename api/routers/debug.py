@@ -0,0 +1,64 @@
+import os
+import hmac
+from fastapi import APIRouter, HTTPException, Header, Depends
+from typing import Any, Dict, Optional
+
+import cache
+import cola_subidas
+import db_profile
+from integrations import cliente_http
+from routers.proyectos import subidas
+
+router = APIRouter()
+
+ADMIN_DEBUG_TOKEN = os.getenv("ADMIN_DEBUG_TOKEN", "")
+
+
+def solo_admin(x_admin_token: Optional[str] = Header(None)):
+    # Sin token configurado los endpoints de depuración no existen
+    if not ADMIN_DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_DEBUG_TOKEN):
+        raise HTTPException(status_code=403, detail="Solo administradores")
+
+
+@router.get("/queries", response_model=Dict[str, Any], dependencies=[Depends(solo_admin)])
+async def listar_consultas(top: int = 50):
+    """Agregados por ruta y SQL (ordenados por tiempo total) y log de consultas lentas."""
+    return db_profile.snapshot(top)
+
+
+@router.delete("/queries", response_model=Dict[str, bool], dependencies=[Depends(solo_admin)])
+async def reiniciar_consultas():
+    db_profile.reset()
+    return {"ok": True}
+
+
+@router.get("/cache", response_model=Dict[str, Any], dependencies=[Depends(solo_admin)])
+async def estadisticas_cache():
+    """Hits/misses, desalojos e invalidaciones de las cachés en memoria."""
+    return cache.stats()
+
+
+@router.delete("/cache", response_model=Dict[str, bool], dependencies=[Depends(solo_admin)])
+async def vaciar_cache():
+    cache.clear()
+    return {"ok": True}
+
+
+@router.get("/http", response_model=Dict[str, Any], dependencies=[Depends(solo_admin)])
+async def estadisticas_http():
+    """Peticiones, reintentos, códigos y latencias por host de las integraciones."""
+    return cliente_http.stats()
+
+
+@router.delete("/http", response_model=Dict[str, bool], dependencies=[Depends(solo_admin)])
+async def reiniciar_http():
+    cliente_http.reset()
+    return {"ok": True}
+
+
+@router.get("/subidas", response_model=Dict[str, Any], dependencies=[Depends(solo_admin)])
+async def estadisticas_subidas():
+    """Subidas en segundo plano: pendientes, reintentos, fallidas y workers."""
+    return {"activo": cola_subidas.SUBIDAS_ASYNC, **subidas.stats()}
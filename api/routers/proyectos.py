@@ -1,22 +1,71 @@
 import os
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List, Dict
+import io
+import re
+from functools import lru_cache
+import csv
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import Any, List, Dict, Optional, Tuple, Union
+from mysql.connector import Error as MySQLError
 
-from db import query, insert, execute
-from schemas import ProyectoCreateRequest, ProyectoResponse, ProyectoEstadoUpdateRequest
+import cola_subidas
+import condicional
+import db
+import resumen
+from db import named_sql, register_query, transaction
+from db_async import query, query_named, query_iter, run
+from schemas import (
+    ProyectoCreateRequest,
+    ProyectoResponse,
+    ProyectoEstadoUpdateRequest,
+    ProyectoRankingItem,
+    ProyectoBusquedaItem,
+    EstadoSubida,
+    SubidaEncolada,
+    ProyectoCampos,
+    ProyectoImportRow,
+    ImportResponse,
+    Pagina,
+)
 from integrations.onedrive import upload_zip_and_share, OneDriveError
 from integrations.sharepoint import upload_zip_and_share_spo, create_folder_and_share_spo
 from integrations.local_sync import create_folder_and_write_local, LocalSyncError
+from sesion import Sesion, requerir_rol
+from streaming import wants_ndjson, ndjson_response
+from respuestas import respuesta_filas, respuesta_pagina
+from paginacion import (
+    PAGE_MAX,
+    registrar_keyset,
+    keyset,
+    keyset_sql,
+    pagina,
+    encode_cursor_relevancia,
+    decode_cursor_relevancia,
+)
 
 router = APIRouter()
 
+_SQL_NUEVO = """
+    INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id, fecha_envio, estado)
+    VALUES(%s, %s, %s, %s, %s, %s, NOW(), %s)
+    """
+
+
+def _crear(params: Tuple[Any, ...], estado: str = "enviado") -> int:
+    # Alta del proyecto y del resumen de estadísticas en un solo commit
+    with transaction() as tx:
+        proyecto_id = tx.insert(_SQL_NUEVO, (*params, estado))
+        resumen.aplicar(tx, altas=[(params[4], params[5], estado, None)])
+        return proyecto_id
+
+
 @router.post("/", response_model=Dict[str, int])
-def crear_proyecto(payload: ProyectoCreateRequest):
-    proyecto_id = insert(
-        """
-        INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id, fecha_envio, estado)
-        VALUES(%s, %s, %s, %s, %s, %s, NOW(), 'enviado')
-        """,
+async def crear_proyecto(payload: ProyectoCreateRequest):
+    proyecto_id = await run(
+        _crear,
         (
             payload.titulo.strip(),
             payload.github_url.strip(),
@@ -29,8 +78,103 @@ def crear_proyecto(payload: ProyectoCreateRequest):
     return {"id": proyecto_id}
 
 
-@router.post("/upload", response_model=Dict[str, int])
-def crear_proyecto_con_archivo(
+_SQL_IMPORT = """
+    INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id,
+                          fecha_envio, estado, puntuacion, comentarios)
+    VALUES(%s, %s, %s, %s, %s, %s, COALESCE(%s, NOW()), COALESCE(%s, 'enviado'), %s, %s)
+    """
+
+
+def _resumen_import(params: Tuple[Any, ...]) -> resumen.FilaResumen:
+    # concurso_id, categoria_id, estado (por defecto 'enviado'), puntuacion
+    return (params[4], params[5], params[7] or "enviado", params[8])
+
+
+def _guardar_lote(lote: List[Tuple[int, Tuple[Any, ...]]], resultado: Dict[str, Any]) -> None:
+    try:
+        with transaction() as tx:
+            ids = tx.insert_many(_SQL_IMPORT, [p for _, p in lote])
+            resumen.aplicar(tx, altas=[_resumen_import(p) for _, p in lote])
+        resultado["ids"].extend(ids)
+    except MySQLError:
+        # El lote fue rechazado (p.ej. una FK inválida): reintentar fila por
+        # fila para insertar las válidas y reportar cuáles fallan
+        for n, params in lote:
+            try:
+                with transaction() as tx:
+                    proyecto_id = tx.insert(_SQL_IMPORT, params)
+                    resumen.aplicar(tx, altas=[_resumen_import(params)])
+                resultado["ids"].append(proyecto_id)
+            except MySQLError as e:
+                resultado["errores"].append({"fila": n, "error": str(e)})
+
+
+def _importar_proyectos(archivo, es_csv: bool, batch_size: int) -> Dict[str, Any]:
+    resultado: Dict[str, Any] = {"ids": [], "errores": []}
+    lote: List[Tuple[int, Tuple[Any, ...]]] = []
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        filas = csv.DictReader(texto) if es_csv else texto
+        for n, fila in enumerate(filas, start=1):
+            try:
+                if es_csv:
+                    data = {k: v for k, v in fila.items() if v not in ("", None)}
+                elif fila.strip():
+                    data = json.loads(fila)
+                else:
+                    continue
+                p = ProyectoImportRow.model_validate(data)
+            except Exception as e:
+                resultado["errores"].append({"fila": n, "error": str(e)})
+                continue
+            lote.append((
+                n,
+                (
+                    p.titulo.strip(),
+                    p.github_url.strip(),
+                    (p.zip_url.strip() if p.zip_url else None),
+                    p.estudiante_id,
+                    p.concurso_id,
+                    p.categoria_id,
+                    p.fecha_envio,
+                    p.estado,
+                    p.puntuacion,
+                    p.comentarios,
+                ),
+            ))
+            if len(lote) >= batch_size:
+                _guardar_lote(lote, resultado)
+                lote = []
+        if lote:
+            _guardar_lote(lote, resultado)
+    finally:
+        # No cerrar el archivo subyacente del UploadFile
+        texto.detach()
+    resultado["insertados"] = len(resultado["ids"])
+    return resultado
+
+
+@router.post("/import", response_model=ImportResponse)
+async def importar_proyectos(
+    archivo: UploadFile = File(...),
+    batch_size: int = Query(db.DB_BULK_BATCH, ge=1, le=5000),
+):
+    """
+    Importa proyectos desde un CSV con encabezados o un NDJSON (un objeto
+    JSON por línea) con los campos de `ProyectoImportRow`. El archivo se lee
+    en streaming y se inserta por lotes de `batch_size`; las filas inválidas
+    se reportan en `errores` con su número de fila sin detener la carga.
+    """
+    es_csv = (archivo.filename or "").lower().endswith(".csv") or "csv" in (archivo.content_type or "")
+    return await run(_importar_proyectos, archivo.file, es_csv, batch_size)
+
+
+@router.post(
+    "/upload",
+    response_model=Dict[str, int],
+    responses={202: {"model": SubidaEncolada, "description": "ZIP encolado (`SUBIDAS_ASYNC=1`)"}},
+)
+async def crear_proyecto_con_archivo(
     titulo: str = Form(...),
     github_url: str = Form(...),
     estudiante_id: int = Form(...),
@@ -41,11 +185,20 @@ def crear_proyecto_con_archivo(
     """
     Crea un proyecto subiendo el ZIP a OneDrive automáticamente y guardando
     el enlace resultante como `zip_url`.
+
+    Con `SUBIDAS_ASYNC=1` responde `202` apenas el ZIP queda en el spool y
+    el proyecto en estado `subiendo`; la subida sigue en segundo plano
+    (`GET /proyectos/{id}/subida`).
     """
+    params = (titulo.strip(), github_url.strip(), None, estudiante_id, concurso_id, categoria_id)
+    if cola_subidas.SUBIDAS_ASYNC:
+        return await _encolar_subida(params, titulo, zip_file)
+
     target = os.getenv("GRAPH_TARGET", "onedrive").lower()
     try:
         if target == "sharepoint":
-            link = upload_zip_and_share_spo(
+            link = await run_in_threadpool(
+                upload_zip_and_share_spo,
                 concurso_id=concurso_id,
                 categoria_id=categoria_id,
                 estudiante_id=estudiante_id,
@@ -53,7 +206,8 @@ def crear_proyecto_con_archivo(
                 zip_file=zip_file,
             )
         else:
-            link = upload_zip_and_share(
+            link = await run_in_threadpool(
+                upload_zip_and_share,
                 concurso_id=concurso_id,
                 categoria_id=categoria_id,
                 estudiante_id=estudiante_id,
@@ -65,25 +219,39 @@ def crear_proyecto_con_archivo(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error inesperado: {e}")
 
-    proyecto_id = insert(
-        """
-        INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id, fecha_envio, estado)
-        VALUES(%s, %s, %s, %s, %s, %s, NOW(), 'enviado')
-        """,
-        (
-            titulo.strip(),
-            github_url.strip(),
-            link,
-            estudiante_id,
-            concurso_id,
-            categoria_id,
-        ),
-    )
+    proyecto_id = await run(_crear, (*params[:2], link, *params[3:]))
     return {"id": proyecto_id}
 
 
+async def _encolar_subida(params: Tuple[Any, ...], titulo: str, zip_file: UploadFile) -> JSONResponse:
+    if await run_in_threadpool(subidas.pendientes) >= cola_subidas.SUBIDAS_PENDIENTES_MAX:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas subidas pendientes, reintenta en unos minutos",
+            headers={"Retry-After": "60"},
+        )
+    temporal = await run_in_threadpool(subidas.guardar_temporal, zip_file.file)
+    try:
+        proyecto_id = await run(_crear, params, "subiendo")
+    except BaseException:
+        cola_subidas.descartar(temporal)
+        raise
+    _, _, _, estudiante_id, concurso_id, categoria_id = params
+    await run_in_threadpool(
+        subidas.encolar,
+        proyecto_id,
+        temporal,
+        {"concurso_id": concurso_id, "categoria_id": categoria_id, "estudiante_id": estudiante_id, "titulo": titulo},
+    )
+    return JSONResponse(
+        status_code=202,
+        content=SubidaEncolada(id=proyecto_id, estado="subiendo").model_dump(),
+        headers={"Location": f"/proyectos/{proyecto_id}/subida"},
+    )
+
+
 @router.post("/crear_carpeta", response_model=Dict[str, int])
-def crear_proyecto_con_carpeta(
+async def crear_proyecto_con_carpeta(
     titulo: str = Form(...),
     github_url: str = Form(...),
     estudiante_id: int = Form(...),
@@ -98,7 +266,8 @@ def crear_proyecto_con_carpeta(
     target = os.getenv("GRAPH_TARGET", "onedrive").lower()
     try:
         if target == "sharepoint":
-            link = create_folder_and_share_spo(
+            link = await run_in_threadpool(
+                create_folder_and_share_spo,
                 concurso_id=concurso_id,
                 categoria_id=categoria_id,
                 estudiante_id=estudiante_id,
@@ -107,7 +276,8 @@ def crear_proyecto_con_carpeta(
             )
         elif target in ("local", "local_sync", "filesystem"):
             # En modo local, retornamos la ruta local como "link"
-            link = create_folder_and_write_local(
+            link = await run_in_threadpool(
+                create_folder_and_write_local,
                 concurso_id=concurso_id,
                 categoria_id=categoria_id,
                 estudiante_id=estudiante_id,
@@ -123,11 +293,8 @@ def crear_proyecto_con_carpeta(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error inesperado: {e}")
 
-    proyecto_id = insert(
-        """
-        INSERT INTO proyectos(titulo, github_url, zip_url, estudiante_id, concurso_id, categoria_id, fecha_envio, estado)
-        VALUES(%s, %s, %s, %s, %s, %s, NOW(), 'enviado')
-        """,
+    proyecto_id = await run(
+        _crear,
         (
             titulo.strip(),
             github_url.strip(),
@@ -139,10 +306,9 @@ def crear_proyecto_con_carpeta(
     )
     return {"id": proyecto_id}
 
-@router.get("/por_concurso/{concurso_id}", response_model=List[ProyectoResponse])
-def listar_por_concurso(concurso_id: int):
-    rows = query(
-        """
+_POR_CONCURSO = registrar_keyset(
+    "proyectos.por_concurso",
+    """
         SELECT p.id, p.titulo, p.github_url, p.zip_url, p.estudiante_id, p.concurso_id, p.categoria_id,
                p.fecha_envio, p.estado, p.puntuacion, p.comentarios,
                e.nombres AS estudiante_nombres, e.apellidos AS estudiante_apellidos, e.correo AS estudiante_correo,
@@ -150,17 +316,16 @@ def listar_por_concurso(concurso_id: int):
         FROM proyectos p
         JOIN estudiantes e ON e.id = p.estudiante_id
         LEFT JOIN categorias c ON c.id = p.categoria_id
-        WHERE p.concurso_id=%s
+        WHERE p.concurso_id=%s {keyset}
         ORDER BY p.fecha_envio DESC, p.id DESC
         """,
-        (concurso_id,),
-    )
-    return rows
+    "p.fecha_envio",
+    "p.id",
+)
 
-@router.get("/por_categoria/{categoria_id}", response_model=List[ProyectoResponse])
-def listar_por_categoria(categoria_id: int):
-    rows = query(
-        """
+_POR_CATEGORIA = registrar_keyset(
+    "proyectos.por_categoria",
+    """
         SELECT p.id, p.titulo, p.github_url, p.zip_url, p.estudiante_id, p.concurso_id, p.categoria_id,
                p.fecha_envio, p.estado, p.puntuacion, p.comentarios,
                e.nombres AS estudiante_nombres, e.apellidos AS estudiante_apellidos, e.correo AS estudiante_correo,
@@ -168,31 +333,359 @@ def listar_por_categoria(categoria_id: int):
         FROM proyectos p
         JOIN estudiantes e ON e.id = p.estudiante_id
         LEFT JOIN categorias c ON c.id = p.categoria_id
-        WHERE p.categoria_id=%s
+        WHERE p.categoria_id=%s {keyset}
         ORDER BY p.fecha_envio DESC, p.id DESC
         """,
-        (categoria_id,),
-    )
-    return rows
+    "p.fecha_envio",
+    "p.id",
+)
 
-@router.get("/estudiante/{estudiante_id}", response_model=List[ProyectoResponse])
-def listar_por_estudiante(estudiante_id: int):
-    rows = query(
-        """
+_POR_ESTUDIANTE = registrar_keyset(
+    "proyectos.por_estudiante",
+    """
         SELECT p.id, p.titulo, p.github_url, p.zip_url, p.estudiante_id, p.concurso_id, p.categoria_id,
                p.fecha_envio, p.estado, p.puntuacion, p.comentarios,
                c.nombre AS categoria_nombre
         FROM proyectos p
         LEFT JOIN categorias c ON c.id = p.categoria_id
-        WHERE p.estudiante_id=%s
+        WHERE p.estudiante_id=%s {keyset}
         ORDER BY p.fecha_envio DESC, p.id DESC
         """,
-        (estudiante_id,),
+    "p.fecha_envio",
+    "p.id",
+)
+
+# Huella para GET condicionales: altas y bajas cambian COUNT/MAX(id) y
+# cualquier UPDATE mueve fecha_modificacion (ON UPDATE CURRENT_TIMESTAMP).
+# Se resuelve solo con idx_proyectos_concurso_modif.
+_VERSION_CONCURSO = register_query(
+    "proyectos.version_concurso",
+    """
+        SELECT COUNT(*) AS n, MAX(id) AS max_id, MAX(fecha_modificacion) AS modificado,
+               (SELECT MAX(fecha_modificacion) FROM estudiantes) AS estudiantes_modificado,
+               (SELECT MAX(fecha_modificacion) FROM categorias WHERE concurso_id=%s) AS categorias_modificado
+        FROM proyectos
+        WHERE concurso_id=%s
+        """,
+)
+
+# Para OpenAPI: listado completo o proyección de ?fields=, con o sin paginar
+_LISTADO = Union[
+    List[ProyectoResponse], Pagina[ProyectoResponse], List[ProyectoCampos], Pagina[ProyectoCampos]
+]
+
+# ?fields=: campo público -> (expresión SQL, alias del JOIN que necesita).
+# El orden es el de ProyectoResponse.
+_CAMPOS: Dict[str, Tuple[str, Optional[str]]] = {
+    "id": ("p.id", None),
+    "titulo": ("p.titulo", None),
+    "github_url": ("p.github_url", None),
+    "zip_url": ("p.zip_url", None),
+    "estudiante_id": ("p.estudiante_id", None),
+    "concurso_id": ("p.concurso_id", None),
+    "categoria_id": ("p.categoria_id", None),
+    "fecha_envio": ("p.fecha_envio", None),
+    "estado": ("p.estado", None),
+    "puntuacion": ("p.puntuacion", None),
+    "comentarios": ("p.comentarios", None),
+    "estudiante_nombres": ("e.nombres AS estudiante_nombres", "e"),
+    "estudiante_apellidos": ("e.apellidos AS estudiante_apellidos", "e"),
+    "estudiante_correo": ("e.correo AS estudiante_correo", "e"),
+    "categoria_nombre": ("c.nombre AS categoria_nombre", "c"),
+}
+# Las FK garantizan que cada proyecto tiene estudiante y categoría, así que
+# omitir un JOIN no cambia qué filas salen
+_JOINS = {
+    "e": "JOIN estudiantes e ON e.id = p.estudiante_id",
+    "c": "LEFT JOIN categorias c ON c.id = p.categoria_id",
+}
+_FIELDS_DOC = "Campos separados por coma (p.ej. `id,titulo,estado`); `id` siempre se incluye"
+
+
+def _parsear_campos(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if fields is None:
+        return None
+    pedidos = {f.strip() for f in fields.split(",") if f.strip()}
+    desconocidos = pedidos - _CAMPOS.keys()
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(sorted(desconocidos))}. Válidos: {', '.join(_CAMPOS)}",
+        )
+    # Orden canónico para que cada combinación genere un único SQL
+    return tuple(c for c in _CAMPOS if c in pedidos or c == "id")
+
+
+@lru_cache(maxsize=256)
+def _sql_proyeccion(filtro: str, campos: Tuple[str, ...], paginado: bool) -> str:
+    seleccion = list(campos)
+    if paginado and "fecha_envio" not in seleccion:
+        seleccion.append("fecha_envio")  # la necesita el cursor
+    alias = {_CAMPOS[c][1] for c in seleccion}
+    joins = " ".join(j for a, j in _JOINS.items() if a in alias)
+    return f"""
+        SELECT {", ".join(_CAMPOS[c][0] for c in seleccion)}
+        FROM proyectos p {joins}
+        WHERE {filtro} {{keyset}}
+        ORDER BY p.fecha_envio DESC, p.id DESC
+        """
+
+
+async def _listar_campos(
+    filtro: str,
+    valor: int,
+    campos: Tuple[str, ...],
+    limit: Optional[int],
+    after: Optional[str],
+    accept: Optional[str],
+) -> Response:
+    sql, params = keyset_sql(
+        _sql_proyeccion(filtro, campos, limit is not None), "p.fecha_envio", "p.id", (valor,), limit, after
     )
-    return rows
+    if limit is None and wants_ndjson(accept):
+        return ndjson_response(query_iter(sql, params), None)
+    # Las filas ya traen solo los campos pedidos: se serializan tal cual
+    rows = await query(sql, params)
+    if limit is None:
+        return respuesta_filas(rows, None, accept)
+    data = pagina(rows, limit, "fecha_envio")
+    if "fecha_envio" not in campos:
+        for row in data["items"]:
+            del row["fecha_envio"]
+    return respuesta_pagina(data, None, accept)
+
+@router.get("/por_concurso/{concurso_id}", response_model=_LISTADO)
+async def listar_por_concurso(
+    concurso_id: int,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description=_FIELDS_DOC),
+):
+    campos = _parsear_campos(fields)
+    huella = (await query_named(_VERSION_CONCURSO, (concurso_id, concurso_id)))[0]
+    no_modificado, cabeceras = condicional.verificar(request, huella)
+    if no_modificado is not None:
+        return no_modificado
+
+    if campos is not None:
+        respuesta = await _listar_campos("p.concurso_id=%s", concurso_id, campos, limit, after, accept)
+    elif limit is not None:
+        key, params = keyset(_POR_CONCURSO, (concurso_id,), limit, after)
+        rows = await query_named(key, params)
+        respuesta = respuesta_pagina(pagina(rows, limit, "fecha_envio"), ProyectoResponse, accept)
+    elif wants_ndjson(accept):
+        respuesta = ndjson_response(query_iter(named_sql(_POR_CONCURSO), (concurso_id,)), ProyectoResponse)
+    else:
+        respuesta = respuesta_filas(await query_named(_POR_CONCURSO, (concurso_id,)), ProyectoResponse, accept)
+    respuesta.headers.update(cabeceras)
+    return respuesta
+
+@router.get("/por_categoria/{categoria_id}", response_model=_LISTADO)
+async def listar_por_categoria(
+    categoria_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description=_FIELDS_DOC),
+):
+    campos = _parsear_campos(fields)
+    if campos is not None:
+        return await _listar_campos("p.categoria_id=%s", categoria_id, campos, limit, after, accept)
+    if limit is not None:
+        key, params = keyset(_POR_CATEGORIA, (categoria_id,), limit, after)
+        rows = await query_named(key, params)
+        return respuesta_pagina(pagina(rows, limit, "fecha_envio"), ProyectoResponse, accept)
+    if wants_ndjson(accept):
+        return ndjson_response(query_iter(named_sql(_POR_CATEGORIA), (categoria_id,)), ProyectoResponse)
+    return respuesta_filas(await query_named(_POR_CATEGORIA, (categoria_id,)), ProyectoResponse, accept)
+
+@router.get("/estudiante/me", response_model=_LISTADO)
+async def listar_mis_proyectos(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description=_FIELDS_DOC),
+    sesion: Sesion = Depends(requerir_rol("estudiante")),
+):
+    """Como `/estudiante/{estudiante_id}` con el id del token de sesión."""
+    return await listar_por_estudiante(sesion.id, limit, after, accept, fields)
+
+@router.get("/estudiante/{estudiante_id}", response_model=_LISTADO)
+async def listar_por_estudiante(
+    estudiante_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description=_FIELDS_DOC),
+):
+    campos = _parsear_campos(fields)
+    if campos is not None:
+        return await _listar_campos("p.estudiante_id=%s", estudiante_id, campos, limit, after, accept)
+    if limit is not None:
+        key, params = keyset(_POR_ESTUDIANTE, (estudiante_id,), limit, after)
+        rows = await query_named(key, params)
+        return respuesta_pagina(pagina(rows, limit, "fecha_envio"), ProyectoResponse, accept)
+    return respuesta_filas(await query_named(_POR_ESTUDIANTE, (estudiante_id,)), ProyectoResponse, accept)
+
+# Ranking: el índice (concurso_id|categoria_id, puntuacion DESC, fecha_envio,
+# id, estado) de DB_SETUP.md ya es el ranking precalculado; InnoDB lo mantiene
+# en cada UPDATE de puntuacion/estado, y el top-N lee N entradas del índice
+# en orden (sin filesort) más N búsquedas por PK para los JOIN.
+_RANKING_SQL = """
+        SELECT p.id, p.titulo, p.github_url, p.zip_url, p.estudiante_id, p.concurso_id, p.categoria_id,
+               p.fecha_envio, p.estado, p.puntuacion, p.comentarios,
+               e.nombres AS estudiante_nombres, e.apellidos AS estudiante_apellidos, e.correo AS estudiante_correo,
+               c.nombre AS categoria_nombre
+        FROM proyectos p
+        JOIN estudiantes e ON e.id = p.estudiante_id
+        LEFT JOIN categorias c ON c.id = p.categoria_id
+        WHERE {filtro} AND p.puntuacion IS NOT NULL AND p.estado <> 'rechazado'
+        ORDER BY p.puntuacion DESC, p.fecha_envio ASC, p.id ASC
+        LIMIT %s
+        """
+
+_RANKING_CONCURSO = register_query(
+    "proyectos.ranking_concurso", _RANKING_SQL.format(filtro="p.concurso_id=%s")
+)
+_RANKING_CATEGORIA = register_query(
+    "proyectos.ranking_categoria", _RANKING_SQL.format(filtro="p.categoria_id=%s AND p.concurso_id=%s")
+)
+
+@router.get("/ranking/{concurso_id}", response_model=List[ProyectoRankingItem])
+async def ranking(
+    concurso_id: int,
+    categoria_id: Optional[int] = None,
+    top: int = Query(10, ge=1, le=PAGE_MAX),
+    accept: Optional[str] = Header(None),
+):
+    """Proyectos evaluados (no rechazados) por puntuación; a igual puntuación gana el envío más antiguo."""
+    if categoria_id is not None:
+        rows = await query_named(_RANKING_CATEGORIA, (categoria_id, concurso_id, top))
+    else:
+        rows = await query_named(_RANKING_CONCURSO, (concurso_id, top))
+    filas = [dict(row, posicion=i) for i, row in enumerate(rows, start=1)]
+    return respuesta_filas(filas, ProyectoRankingItem, accept)
+
+# Búsqueda: índices FULLTEXT de DB_SETUP.md sobre (titulo, comentarios) y
+# sobre (nombres, apellidos, correo) del estudiante. Cada MATCH usa su
+# índice por separado y se unen por proyecto; la relevancia es la suma de
+# ambas. La tabla derivada `r` sigue agregando todas las coincidencias
+# (la relevancia es una suma), pero ordena, aplica el cursor (relevancia,
+# id) y limita antes de los JOIN: solo las filas de la página se buscan por
+# PK en proyectos, estudiantes y categorias.
+_BUSCAR_SQL = """
+        SELECT p.id, p.titulo, p.github_url, p.zip_url, p.estudiante_id, p.concurso_id, p.categoria_id,
+               p.fecha_envio, p.estado, p.puntuacion, p.comentarios,
+               e.nombres AS estudiante_nombres, e.apellidos AS estudiante_apellidos, e.correo AS estudiante_correo,
+               c.nombre AS categoria_nombre, r.relevancia
+        FROM (
+            SELECT id, SUM(relevancia) AS relevancia
+            FROM (
+                SELECT p.id, MATCH(p.titulo, p.comentarios) AGAINST (%s IN BOOLEAN MODE) AS relevancia
+                FROM proyectos p
+                WHERE MATCH(p.titulo, p.comentarios) AGAINST (%s IN BOOLEAN MODE) {filtro}
+                UNION ALL
+                SELECT p.id, MATCH(e.nombres, e.apellidos, e.correo) AGAINST (%s IN BOOLEAN MODE)
+                FROM estudiantes e
+                JOIN proyectos p ON p.estudiante_id = e.id
+                WHERE MATCH(e.nombres, e.apellidos, e.correo) AGAINST (%s IN BOOLEAN MODE) {filtro}
+            ) m
+            GROUP BY id
+            {keyset}
+            ORDER BY relevancia DESC, id DESC
+            LIMIT %s
+        ) r
+        JOIN proyectos p ON p.id = r.id
+        JOIN estudiantes e ON e.id = p.estudiante_id
+        LEFT JOIN categorias c ON c.id = p.categoria_id
+        ORDER BY r.relevancia DESC, r.id DESC
+        LIMIT %s
+        """
+
+
+def _registrar_busqueda(key: str, filtro: str) -> str:
+    register_query(key, _BUSCAR_SQL.format(filtro=filtro, keyset=""))
+    register_query(
+        f"{key}:siguiente", _BUSCAR_SQL.format(filtro=filtro, keyset="HAVING (relevancia, id) < (%s, %s)")
+    )
+    return key
+
+
+_BUSCAR = _registrar_busqueda("proyectos.buscar", "")
+_BUSCAR_CONCURSO = _registrar_busqueda("proyectos.buscar_concurso", "AND p.concurso_id=%s")
+
+# innodb_ft_min_token_size (3 por defecto): palabras más cortas no están en el índice
+_BUSQUEDA_MIN_TOKEN = 3
+_BUSQUEDA_MAX_TERMINOS = 8
+
+
+def _terminos_busqueda(q: str) -> str:
+    """
+    Convierte el texto libre en una consulta BOOLEAN MODE: cada palabra como
+    prefijo (`reserv*` encuentra "reservas") y sin operadores del usuario.
+    Basta con que aparezca alguna; las que aparecen más suben en relevancia.
+    """
+    terminos = [t for t in re.findall(r"\w+", q.lower()) if len(t) >= _BUSQUEDA_MIN_TOKEN]
+    terminos = list(dict.fromkeys(terminos))[:_BUSQUEDA_MAX_TERMINOS]
+    if not terminos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La búsqueda necesita al menos una palabra de {_BUSQUEDA_MIN_TOKEN} o más caracteres",
+        )
+    return " ".join(f"{t}*" for t in terminos)
+
+
+@router.get("/buscar", response_model=Pagina[ProyectoBusquedaItem])
+async def buscar(
+    q: str = Query(..., max_length=200),
+    concurso_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=PAGE_MAX),
+    after: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+):
+    """
+    Busca en título y comentarios del proyecto y en nombres, apellidos y
+    correo del estudiante, ordenado por relevancia. Se pagina con
+    `limit`/`after` como los listados.
+    """
+    terminos = _terminos_busqueda(q)
+    filtro = (concurso_id,) if concurso_id is not None else ()
+    params = (terminos, terminos, *filtro, terminos, terminos, *filtro)
+    key = _BUSCAR_CONCURSO if concurso_id is not None else _BUSCAR
+    if after:
+        key = f"{key}:siguiente"
+        params = (*params, *decode_cursor_relevancia(after))
+    rows = await query_named(key, (*params, limit + 1, limit + 1))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor_relevancia(rows[-1]["relevancia"], rows[-1]["id"])
+    return respuesta_pagina({"items": rows, "next_cursor": next_cursor}, ProyectoBusquedaItem, accept)
+
+_SQL_FILA_RESUMEN = "SELECT concurso_id, categoria_id, estado, puntuacion FROM proyectos WHERE id=%s"
+
+
+def _fila_resumen(row: Dict[str, Any]) -> resumen.FilaResumen:
+    return (row["concurso_id"], row["categoria_id"], row["estado"], row["puntuacion"])
+
+
+def _actualizar_estado(proyecto_id: int, sql: str, params: Tuple[Any, ...]) -> int:
+    # El resumen resta la fila anterior y suma la nueva tal como quedó
+    # guardada (puntuacion ya redondeada por DECIMAL)
+    with transaction() as tx:
+        antes = tx.query(_SQL_FILA_RESUMEN + " FOR UPDATE", (proyecto_id,))
+        if not antes:
+            return 0
+        affected = tx.execute(sql, params)
+        despues = tx.query(_SQL_FILA_RESUMEN, (proyecto_id,))
+        resumen.aplicar(tx, altas=[_fila_resumen(despues[0])], bajas=[_fila_resumen(antes[0])])
+        return affected
 
 @router.patch("/{proyecto_id}/estado", response_model=Dict[str, int])
-def actualizar_estado(proyecto_id: int, payload: ProyectoEstadoUpdateRequest):
+async def actualizar_estado(proyecto_id: int, payload: ProyectoEstadoUpdateRequest):
     campos = []
     valores = []
     if payload.estado is not None:
@@ -210,7 +703,101 @@ def actualizar_estado(proyecto_id: int, payload: ProyectoEstadoUpdateRequest):
 
     valores.append(proyecto_id)
     sql = f"UPDATE proyectos SET {', '.join(campos)} WHERE id=%s"
-    affected = execute(sql, tuple(valores))
+    affected = await run(_actualizar_estado, proyecto_id, sql, tuple(valores))
     if affected == 0:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
-    return {"updated": affected}
\ No newline at end of file
+    return {"updated": affected}
+
+# --- Subidas en segundo plano (SUBIDAS_ASYNC=1, ver cola_subidas) ---
+
+_SQL_SUBIDA_LISTA = """
+    UPDATE proyectos SET zip_url=%s, estado=IF(estado='subiendo', 'enviado', estado) WHERE id=%s
+    """
+_SQL_SUBIDA_FALLIDA = "UPDATE proyectos SET estado='error_subida' WHERE id=%s AND estado='subiendo'"
+_SQL_SUBIDA_REINTENTO = "UPDATE proyectos SET estado='subiendo' WHERE id=%s AND estado='error_subida'"
+# Proyectos en `subiendo` sin trabajo en el spool (caída entre el INSERT y
+# el encolado); el margen evita tocar altas que están encolándose ahora
+_SQL_SUBIDAS_HUERFANAS = """
+    SELECT id FROM proyectos
+    WHERE estado='subiendo' AND fecha_envio < NOW() - INTERVAL 10 MINUTE
+    """
+
+
+def _procesar_subida(meta: Dict[str, Any], ruta_zip: str) -> None:
+    target = os.getenv("GRAPH_TARGET", "onedrive").lower()
+    subir = upload_zip_and_share_spo if target == "sharepoint" else upload_zip_and_share
+    with open(ruta_zip, "rb") as f:
+        link = subir(
+            concurso_id=meta["concurso_id"],
+            categoria_id=meta["categoria_id"],
+            estudiante_id=meta["estudiante_id"],
+            titulo=meta["titulo"],
+            zip_file=f,
+        )
+    # Si el proyecto se borró mientras tanto no hay nada que actualizar
+    _actualizar_estado(meta["proyecto_id"], _SQL_SUBIDA_LISTA, (link, meta["proyecto_id"]))
+
+
+def _subida_fallida(meta: Dict[str, Any]) -> None:
+    _actualizar_estado(meta["proyecto_id"], _SQL_SUBIDA_FALLIDA, (meta["proyecto_id"],))
+
+
+subidas = cola_subidas.ColaSubidas(_procesar_subida, _subida_fallida)
+
+
+def _marcar_huerfanas() -> int:
+    marcadas = 0
+    for row in db.query(_SQL_SUBIDAS_HUERFANAS):
+        if subidas.leer_meta(row["id"]) is None:
+            marcadas += _actualizar_estado(row["id"], _SQL_SUBIDA_FALLIDA, (row["id"],))
+    return marcadas
+
+
+async def iniciar_subidas() -> None:
+    """Arranca los workers y retoma lo que quedó en el spool (lifespan de main)."""
+    if not cola_subidas.SUBIDAS_ASYNC:
+        return
+    await run_in_threadpool(subidas.iniciar)
+    try:
+        marcadas = await run(_marcar_huerfanas)
+    except Exception:
+        cola_subidas.logger.exception("No se pudieron revisar las subidas huérfanas")
+        return
+    if marcadas:
+        cola_subidas.logger.warning("Proyectos en 'subiendo' sin archivo en el spool: %d", marcadas)
+
+
+async def detener_subidas() -> None:
+    await run_in_threadpool(subidas.detener)
+
+
+@router.get("/{proyecto_id}/subida", response_model=EstadoSubida)
+async def estado_subida(proyecto_id: int):
+    """Estado de la subida del ZIP: intentos y último error mientras siga pendiente."""
+    rows = await query("SELECT estado, zip_url FROM proyectos WHERE id=%s", (proyecto_id,))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+    resultado = {"proyecto_id": proyecto_id, **rows[0]}
+    meta = await run_in_threadpool(subidas.leer_meta, proyecto_id)
+    if meta is not None:
+        resultado["intentos"] = meta["intentos"]
+        resultado["error"] = meta["error"]
+        if meta["siguiente_intento"]:
+            resultado["siguiente_intento"] = datetime.fromtimestamp(meta["siguiente_intento"], tz=timezone.utc)
+    return resultado
+
+
+@router.post("/{proyecto_id}/subida/reintentar", response_model=Dict[str, int], status_code=202)
+async def reintentar_subida(proyecto_id: int):
+    """Vuelve a encolar una subida en `error_subida` cuyo ZIP sigue en el spool."""
+    if not cola_subidas.SUBIDAS_ASYNC:
+        raise HTTPException(status_code=409, detail="Las subidas en segundo plano están desactivadas")
+    meta = await run_in_threadpool(subidas.leer_meta, proyecto_id)
+    if meta is None or not meta["fallida"]:
+        raise HTTPException(status_code=404, detail="No hay subida fallida para reintentar")
+    if await run(_actualizar_estado, proyecto_id, _SQL_SUBIDA_REINTENTO, (proyecto_id,)) == 0:
+        raise HTTPException(status_code=404, detail="Proyecto no encontrado o no está en error_subida")
+    if not await run_in_threadpool(subidas.reintentar, proyecto_id):
+        await run(_subida_fallida, meta)
+        raise HTTPException(status_code=404, detail="No hay subida fallida para reintentar")
+    return {"id": proyecto_id}
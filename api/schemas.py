@@ -1,7 +1,13 @@
-from typing import Optional, List
+from typing import Dict, Generic, Optional, List, TypeVar
 from pydantic import BaseModel
 from datetime import datetime
 
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 class AdminLoginRequest(BaseModel):
     correo: str
     contrasena: str
@@ -20,6 +26,15 @@ class AdminResponse(BaseModel):
     correo: str
     numero_telefono: str
 
+# login y firebase: perfil más el token de sesión (ver sesion.py)
+class AdminSesionResponse(AdminResponse):
+    token: str
+    token_expira: datetime
+
+# ID token que la app obtiene de Firebase Auth tras iniciar sesión
+class FirebaseLoginRequest(BaseModel):
+    id_token: str
+
 class EstudianteLoginRequest(BaseModel):
     correo: str
     contrasena: str
@@ -41,6 +56,10 @@ class EstudianteResponse(BaseModel):
     numero_telefono: str
     ciclo: int
 
+class EstudianteSesionResponse(EstudianteResponse):
+    token: str
+    token_expira: datetime
+
 class ConcursoCreateRequest(BaseModel):
     nombre: str
     administrador_id: int
@@ -83,6 +102,23 @@ class ProyectoCreateRequest(BaseModel):
     concurso_id: int
     categoria_id: int
 
+# Importación masiva: además de los campos de creación permite conservar
+# la fecha, estado y evaluación originales (p.ej. envíos del año anterior)
+class ProyectoImportRow(ProyectoCreateRequest):
+    fecha_envio: Optional[datetime] = None
+    estado: Optional[str] = None
+    puntuacion: Optional[float] = None
+    comentarios: Optional[str] = None
+
+class ImportErrorFila(BaseModel):
+    fila: int
+    error: str
+
+class ImportResponse(BaseModel):
+    insertados: int
+    ids: List[int]
+    errores: List[ImportErrorFila]
+
 class ProyectoResponse(BaseModel):
     id: int
     titulo: str
@@ -101,7 +137,57 @@ class ProyectoResponse(BaseModel):
     estudiante_correo: Optional[str] = None
     categoria_nombre: Optional[str] = None
 
+# Proyección de `?fields=`: solo se envían los campos pedidos (id siempre)
+class ProyectoCampos(BaseModel):
+    id: int
+    titulo: Optional[str] = None
+    github_url: Optional[str] = None
+    zip_url: Optional[str] = None
+    estudiante_id: Optional[int] = None
+    concurso_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    fecha_envio: Optional[datetime] = None
+    estado: Optional[str] = None
+    puntuacion: Optional[float] = None
+    comentarios: Optional[str] = None
+    estudiante_nombres: Optional[str] = None
+    estudiante_apellidos: Optional[str] = None
+    estudiante_correo: Optional[str] = None
+    categoria_nombre: Optional[str] = None
+
+class ProyectoRankingItem(ProyectoResponse):
+    posicion: int
+
+class ProyectoBusquedaItem(ProyectoResponse):
+    relevancia: float
+
 class ProyectoEstadoUpdateRequest(BaseModel):
     estado: Optional[str] = None
     comentarios: Optional[str] = None
-    puntuacion: Optional[float] = None
\ No newline at end of file
+    puntuacion: Optional[float] = None
+
+class SubidaEncolada(BaseModel):
+    id: int
+    estado: str
+
+class EstadoSubida(BaseModel):
+    proyecto_id: int
+    estado: str
+    zip_url: Optional[str] = None
+    intentos: int = 0
+    error: Optional[str] = None
+    siguiente_intento: Optional[datetime] = None
+
+class EstadisticasCategoria(BaseModel):
+    categoria_id: int
+    categoria_nombre: str
+    total: int
+    por_estado: Dict[str, int]
+    promedio_puntuacion: Optional[float] = None
+
+class EstadisticasConcurso(BaseModel):
+    concurso_id: int
+    total: int
+    por_estado: Dict[str, int]
+    promedio_puntuacion: Optional[float] = None
+    categorias: List[EstadisticasCategoria]
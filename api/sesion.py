@@ -0,0 +1,132 @@
+"""
+Tokens de sesión firmados (HMAC-SHA256) que emiten `login` (contraseña) y
+`firebase` (ID token de Firebase verificado).
+
+El token lleva la identidad y el rol (`{"sub": id, "rol": ..., "correo":
+..., "exp": ...}` en base64url, un punto y la firma), así que se verifica
+en el proceso sin ir a la base: las rutas que usan `sesion_actual` o
+`requerir_rol` obtienen el id sin que el cliente lo envíe ni vuelva a pedir
+su perfil.
+
+Todos los workers deben compartir `SESION_SECRET`; sin ella cada proceso
+genera una clave aleatoria al arrancar y sus tokens solo valen en ese
+proceso y hasta que se reinicie. `SESION_TTL_SECONDS` (3600) fija la
+vigencia: al vencer, la app vuelve a enviar su ID token de Firebase.
+
+`by_email` no recibe credenciales y por eso no emite token: conocer un
+correo no basta para obtener una sesión. El ID token de Firebase se
+verifica con `google-auth` (firma, emisor y `aud` = `FIREBASE_PROJECT_ID`)
+y su correo debe estar verificado; sin el paquete o sin la variable el
+endpoint `firebase` responde 503.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException
+from pydantic import BaseModel
+
+try:
+    import requests
+    from cachecontrol import CacheControl
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token as google_id_token
+except ImportError:  # opcional: sin google-auth no hay login con Firebase
+    google_id_token = None
+else:
+    # Sesión compartida con caché HTTP: los certificados de Google se
+    # descargan una vez y se reutilizan mientras dure su Cache-Control
+    _google_request = google_requests.Request(session=CacheControl(requests.Session()))
+
+logger = logging.getLogger("epis.sesion")
+
+SESION_TTL_SECONDS = int(os.getenv("SESION_TTL_SECONDS", "3600"))
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
+_SECRETO = os.getenv("SESION_SECRET", "").encode()
+if not _SECRETO:
+    logger.warning("SESION_SECRET no definido: los tokens de sesión solo valen en este proceso")
+    _SECRETO = secrets.token_bytes(32)
+
+
+class Sesion(BaseModel):
+    id: int
+    rol: str
+    correo: str
+    exp: int
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _firma(carga: str) -> str:
+    return _b64(hmac.new(_SECRETO, carga.encode(), hashlib.sha256).digest())
+
+
+def emitir(id_: int, rol: str, correo: str) -> Tuple[str, datetime]:
+    """Token para el usuario y su fecha de expiración (UTC)."""
+    exp = int(time.time()) + SESION_TTL_SECONDS
+    carga = _b64(json.dumps({"sub": id_, "rol": rol, "correo": correo, "exp": exp}, separators=(",", ":")).encode())
+    return f"{carga}.{_firma(carga)}", datetime.fromtimestamp(exp, tz=timezone.utc)
+
+
+def _no_autorizado(detalle: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detalle, headers={"WWW-Authenticate": "Bearer"})
+
+
+def verificar(token: str) -> Sesion:
+    carga, _, firma = token.partition(".")
+    if not firma or not hmac.compare_digest(firma, _firma(carga)):
+        raise _no_autorizado("Token inválido")
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(carga + "=" * (-len(carga) % 4)))
+        sesion = Sesion(id=datos["sub"], rol=datos["rol"], correo=datos["correo"], exp=datos["exp"])
+    except Exception:
+        raise _no_autorizado("Token inválido")
+    if sesion.exp <= time.time():
+        raise _no_autorizado("Token expirado")
+    return sesion
+
+
+def correo_firebase(id_token: str) -> str:
+    """
+    Correo verificado del ID token de Firebase; 401 si el token no es válido.
+    Bloqueante (puede descargar los certificados): llamarla en el threadpool.
+    """
+    if google_id_token is None or not FIREBASE_PROJECT_ID:
+        raise HTTPException(status_code=503, detail="Login con Firebase no configurado")
+    try:
+        claims = google_id_token.verify_firebase_token(
+            id_token, _google_request, audience=FIREBASE_PROJECT_ID
+        )
+    except ValueError:
+        raise _no_autorizado("ID token de Firebase inválido")
+    if not claims or not claims.get("email") or not claims.get("email_verified"):
+        raise _no_autorizado("ID token de Firebase sin correo verificado")
+    return str(claims["email"]).strip().lower()
+
+
+def sesion_actual(authorization: Optional[str] = Header(None)) -> Sesion:
+    """Dependencia: sesión del header `Authorization: Bearer <token>`."""
+    esquema, _, token = (authorization or "").partition(" ")
+    if esquema.lower() != "bearer" or not token.strip():
+        raise _no_autorizado("Se requiere token de sesión")
+    return verificar(token.strip())
+
+
+def requerir_rol(rol: str) -> Callable[..., Sesion]:
+    """Dependencia que además exige el rol (`admin` o `estudiante`)."""
+
+    def dependencia(sesion: Sesion = Depends(sesion_actual)) -> Sesion:
+        if sesion.rol != rol:
+            raise HTTPException(status_code=403, detail="Rol no autorizado")
+        return sesion
+
+    return dependencia
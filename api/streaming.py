@@ -0,0 +1,33 @@
+"""
+Respuestas en streaming (NDJSON) para listados grandes.
+
+Los clientes lo activan enviando `Accept: application/x-ndjson`; cada fila
+se proyecta a los campos del modelo de respuesta (ver `respuestas.py`) y se
+envía como una línea JSON apenas llega su lote desde MySQL.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from respuestas import dumps, proyectar
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON in accept.lower()
+
+
+async def _lineas(
+    batches: AsyncIterator[List[Dict[str, Any]]], model: Optional[Type[BaseModel]]
+) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(dumps(row) + b"\n" for row in proyectar(rows, model))
+
+
+def ndjson_response(
+    batches: AsyncIterator[List[Dict[str, Any]]], model: Optional[Type[BaseModel]]
+) -> StreamingResponse:
+    """Con `model=None` (proyecciones de `?fields=`) las filas se envían tal cual."""
+    return StreamingResponse(_lineas(batches, model), media_type=NDJSON)